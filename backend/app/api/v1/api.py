@@ -2,7 +2,7 @@
 Main API router
 """
 from fastapi import APIRouter
-from app.api.v1.endpoints import files, requirements, test_cases, jira
+from app.api.v1.endpoints import files, requirements, test_cases, jira, jobs, metrics
 
 api_router = APIRouter()
 
@@ -11,3 +11,5 @@ api_router.include_router(files.router, prefix="/files", tags=["files"])
 api_router.include_router(requirements.router, prefix="/requirements", tags=["requirements"])
 api_router.include_router(test_cases.router, prefix="/test-cases", tags=["test-cases"])
 api_router.include_router(jira.router, prefix="/jira", tags=["jira"])
+api_router.include_router(jobs.router, prefix="/jobs", tags=["jobs"])
+api_router.include_router(metrics.router, prefix="/metrics", tags=["metrics"])
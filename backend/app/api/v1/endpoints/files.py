@@ -2,131 +2,56 @@
 File upload and management endpoints
 """
 import uuid
+import hashlib
 import datetime
-from typing import List
-from fastapi import APIRouter, UploadFile, File, HTTPException, Depends
+from typing import List, Dict, Iterable, Iterator, Optional, Tuple
+from fastapi import APIRouter, UploadFile, File, HTTPException, Depends, Query
 from app.models.schemas import MultiUploadResponse, FileInfo
-from app.services.document_service import document_service
+from app.services.document_service import document_service, PAGE_BREAK
 from app.services.database_service import database_service
 from app.services.vector_db_service import vector_db_service
 from app.services.ai_service import ai_service
+from app.services.job_service import job_service, JobContext
+from app.services.content_index import content_index
+from app.core.config import settings
+from app.core.executors import get_executor, run_blocking
+from app.core.exceptions import DocumentProcessingError
 
 router = APIRouter()
 
 
-@router.post("/upload", response_model=MultiUploadResponse)
+@router.post("/upload", response_model=MultiUploadResponse, status_code=202)
 async def upload_files(
     requirement_files: List[UploadFile] = File([]),
-    input_files: List[UploadFile] = File([])
+    input_files: List[UploadFile] = File([]),
+    use_cache: bool = Query(True, description="Reuse cached AI responses for identical prompts")
 ):
     """
-    Upload requirement and input files for processing
+    Upload requirement and input files and queue them for processing.
+    Poll GET /jobs/{job_id} for progress.
     """
     try:
         print("Uploading files...")
-        filenames = []
         file_id = str(uuid.uuid4())
-        requirement_content = ""
-        input_content = ""
-        count_req = 0
-        count_input = 0
-        
-        # Check for duplicate filenames
-        all_files = requirement_files + input_files
-        existing_files = database_service.get_files()
-        existing_names = {f["filename"] for f in existing_files}
         
-        for file in all_files:
-            if file.filename in existing_names:
-                raise HTTPException(
-                    status_code=400, 
-                    detail=f"File '{file.filename}' has already been uploaded"
-                )
+        # Hash while reading; the request body is gone once the response is sent.
+        # Duplicate content is detected by hash in the pipeline and reused.
+        req_uploads = [await _read_upload(file) for file in requirement_files]
+        input_uploads = [await _read_upload(file) for file in input_files]
         
-        # Process requirement files
-        if requirement_files:
-            req_contents = []
-            req_names = []
-            for file in requirement_files:
-                content = await file.read()
-                extracted_text = document_service.extract_text_from_bytes(file.filename, content)
-                req_contents.append(extracted_text)
-                req_names.append(file.filename)
-            
-            count_req = len(req_contents)
-            requirement_content = "\n\n".join(req_contents)
-            all_req_names = ",".join(req_names)
-            filenames.append(all_req_names)
-            print("requirement_content:", requirement_content)
-            # Store requirements in vector database for semantic search
-            try:
-                vector_db_service.store_document(
-                    content=requirement_content,
-                    metadata={"type": "requirement", "filenames": all_req_names}
-                )
-                print(f"Stored requirement documents in vector DB ({len(req_contents)} chunks expected after split).")
-            except Exception as e:
-                # Don't fail the whole upload on vector DB errors; log and continue
-                print(f"Warning: Failed to store requirements in vector DB: {e}")
-        
-        # Process input files
-        if input_files:
-            requirement_data = []
-            for file in input_files:
-                content = await file.read()
-                extracted_text = document_service.extract_text_from_bytes(file.filename, content)
-                final_requirement=extracted_text.replace("1 text ","").replace("\r","").split("\n")
-                #print(f"extracted_text: {final_requirement}")
-                requirement_data.extend(final_requirement)
-            # Keep track of how many input files were processed
-            count_input = len(input_files)
-            
-            # Process each requirement with semantic search context
-            requirements = []
-            for req in requirement_data:
-                # Skip empty lines
-                if not req.strip():
-                    continue
-                    
-                # Get similar contexts from vector DB
-                limit = 5
-                similar_contexts = vector_db_service.semantic_search(query=req, top_k=limit)
-                #print(f"Similar contexts for requirement '{req}': {similar_contexts}")
-                # Generate requirement with context
-                requirement = ai_service.extract_single_requirement_with_context(req, similar_contexts)
-                if requirement:
-                    requirement_id = str(uuid.uuid4())
-                    req_title_id = f"REQ-{len(requirements)+1:03d}"
-                    
-                    # Prepare requirement for database
-                    db_requirement = {
-                        "file_id": file_id,
-                        "requirement_id": requirement_id,
-                        "req_title_id": req_title_id,
-                        "title": requirement.get("title", "Untitled Requirement"),
-                        "description": requirement.get("description", "No description provided"),
-                        "type": requirement.get("type", "Functional"),
-                        "source": requirement.get("source", "AI Generated with Context"),
-                        "category": requirement.get("category", ""),
-                        "priority": requirement.get("priority", "Medium"),
-                        "created_at": datetime.datetime.now().isoformat()
-                    }
-                    print(f"Generated requirement: {db_requirement}")
-                    requirements.append(db_requirement)
-            
-            # Save generated requirements to database
-            if requirements:
-                database_service.save_requirements(requirements)
-            
-        message = (
-            f"Success! {count_req} requirement documents and {count_input} input files were processed. "
-            "Documents have been vectorized for semantic search."
+        job_id = await run_blocking(
+            "db", job_service.submit, "upload", _run_upload_pipeline, file_id, req_uploads, input_uploads, use_cache
         )
         
+        filenames = []
+        if req_uploads:
+            filenames.append(",".join(name for name, _, _ in req_uploads))
+        
         return MultiUploadResponse(
             file_ids=[file_id], 
             filenames=filenames, 
-            message=message
+            message=f"Upload accepted. Processing {len(req_uploads)} requirement documents and {len(input_uploads)} input files.",
+            job_id=job_id
         )
         
     except HTTPException:
@@ -135,6 +60,174 @@ async def upload_files(
         raise HTTPException(status_code=500, detail=f"Upload/extract failed: {e}")
 
 
+async def _read_upload(file: UploadFile) -> Tuple[str, bytes, str]:
+    """Read an upload in chunks, computing its SHA-256 as it streams"""
+    digest = hashlib.sha256()
+    parts = []
+    while True:
+        chunk = await file.read(settings.UPLOAD_READ_CHUNK_SIZE)
+        if not chunk:
+            break
+        digest.update(chunk)
+        parts.append(chunk)
+    return file.filename, b"".join(parts), digest.hexdigest()
+
+
+def _run_upload_pipeline(
+    job: JobContext,
+    file_id: str,
+    req_uploads: List[Tuple[str, bytes, str]],
+    input_uploads: List[Tuple[str, bytes, str]],
+    use_cache: bool = True
+) -> Dict:
+    """
+    Parse, vectorize and synthesize requirements for one upload.
+    Runs on the background job pool.
+    """
+    failed_lines = []
+    requirements = []
+    reused_files = []
+    
+    # Process requirement files: pages stream straight into the vector store
+    if req_uploads:
+        all_req_names = ",".join(name for name, _, _ in req_uploads)
+        with job.stage("vectorize_requirement_files", total=len(req_uploads)):
+            for i, (filename, content, sha256) in enumerate(req_uploads, start=1):
+                known = content_index.lookup(sha256)
+                if known and known["vectorized"]:
+                    print(f"{filename} matches already vectorized content of {known['filename']}; reusing embeddings.")
+                    reused_files.append({"filename": filename, "matches": known["filename"], "sha256": sha256})
+                    job.progress(i)
+                    continue
+                
+                cached_pages = content_index.pages(sha256) if known else None
+                if cached_pages is not None:
+                    pages = cached_pages
+                else:
+                    pages = document_service.iter_pages(filename, content)
+                
+                # Keep the parsed pages as they stream so they can be indexed by hash
+                parsed_pages = []
+                vectorized = False
+                try:
+                    ingest_stats = vector_db_service.store_pages(
+                        _collect_pages(pages, parsed_pages),
+                        metadata={"type": "requirement", "filenames": all_req_names, "filename": filename}
+                    )
+                    vectorized = True
+                    print(
+                        f"Stored {filename} in vector DB ({ingest_stats['chunks']} chunks "
+                        f"in {len(ingest_stats['batches'])} batches, {ingest_stats['elapsed_seconds']}s)."
+                    )
+                except DocumentProcessingError:
+                    raise
+                except Exception as e:
+                    # Don't fail the whole upload on vector DB errors; log and continue
+                    print(f"Warning: Failed to store {filename} in vector DB: {e}")
+                    if cached_pages is None:
+                        # Finish parsing so the index never holds a truncated document
+                        parsed_pages.extend(pages)
+
+                if vectorized or cached_pages is None:
+                    content_index.record(sha256, filename, parsed_pages, vectorized=vectorized)
+                job.progress(i)
+    
+    # Process input files
+    if input_uploads:
+        with job.stage("parse_input_files", total=len(input_uploads)):
+            requirement_data = []
+            for i, (filename, content, sha256) in enumerate(input_uploads, start=1):
+                known = content_index.lookup(sha256)
+                pages = content_index.pages(sha256) if known else None
+                if pages is not None:
+                    print(f"{filename} matches already parsed content of {known['filename']}; reusing parse result.")
+                    reused_files.append({"filename": filename, "matches": known["filename"], "sha256": sha256})
+                else:
+                    pages = list(document_service.iter_pages(filename, content))
+                    content_index.record(sha256, filename, pages)
+                
+                extracted_text = document_service.flatten_pages(pages).replace(PAGE_BREAK, " ")
+                final_requirement=extracted_text.replace("1 text ","").replace("\r","").split("\n")
+                requirement_data.extend(final_requirement)
+                job.progress(i)
+        
+        # Synthesize requirements concurrently; results keep input order
+        lines = [req for req in requirement_data if req.strip()]
+        with job.stage("synthesize_requirements", total=len(lines)):
+            # Calls fan out on the shared AI pool; the AI scheduler caps how many reach Gemini
+            results = []
+            for result in get_executor("ai").map(lambda line: _synthesize_requirement(line, use_cache), lines):
+                results.append(result)
+                job.progress(len(results))
+
+        for line_no, (line, (requirement, error)) in enumerate(zip(lines, results), start=1):
+            if error:
+                print(f"Requirement synthesis failed for line {line_no}: {error}")
+                failed_lines.append({"line": line_no, "text": line, "error": error})
+                continue
+            if not requirement:
+                continue
+
+            requirement_id = str(uuid.uuid4())
+            req_title_id = f"REQ-{len(requirements)+1:03d}"
+
+            # Prepare requirement for database
+            db_requirement = {
+                "file_id": file_id,
+                "requirement_id": requirement_id,
+                "req_title_id": req_title_id,
+                "title": requirement.get("title", "Untitled Requirement"),
+                "description": requirement.get("description", "No description provided"),
+                "type": requirement.get("type", "Functional"),
+                "source": requirement.get("source", "AI Generated with Context"),
+                "category": requirement.get("category", ""),
+                "priority": requirement.get("priority", "Medium"),
+                "created_at": datetime.datetime.now().isoformat()
+            }
+            print(f"Generated requirement: {db_requirement}")
+            requirements.append(db_requirement)
+        
+        # Save generated requirements to database
+        if requirements:
+            with job.stage("save_requirements", total=len(requirements)):
+                database_service.save_requirements(requirements)
+                job.progress(len(requirements))
+    
+    message = (
+        f"Success! {len(req_uploads)} requirement documents and {len(input_uploads)} input files were processed. "
+        "Documents have been vectorized for semantic search."
+    )
+    if failed_lines:
+        message += f" {len(failed_lines)} input lines could not be processed."
+    
+    return {
+        "file_id": file_id,
+        "message": message,
+        "reused_files": reused_files,
+        "requirements_generated": len(requirements),
+        "failed_lines": failed_lines,
+    }
+
+
+def _collect_pages(pages: Iterable[Tuple[int, str]], sink: List[Tuple[int, str]]) -> Iterator[Tuple[int, str]]:
+    """Pass pages through while appending them to sink"""
+    for page in pages:
+        sink.append(page)
+        yield page
+
+
+def _synthesize_requirement(line: str, use_cache: bool = True) -> Tuple[Optional[Dict], Optional[str]]:
+    """
+    Build one requirement from an input line using semantic search context.
+    Returns (requirement, error) so a failing line never aborts the batch.
+    """
+    try:
+        similar_contexts = vector_db_service.semantic_search(query=line, top_k=5)
+        return ai_service.extract_single_requirement_with_context(line, similar_contexts, use_cache=use_cache), None
+    except Exception as e:
+        return None, str(e)
+
+
 @router.get("/", response_model=List[FileInfo])
 def get_files():
     """Get all uploaded files"""
@@ -145,7 +238,7 @@ def get_files():
 
 
 @router.get("/search")
-def semantic_search(query: str = None, limit: int = 5):
+async def semantic_search(query: str = None, limit: int = 5):
     """
     Perform semantic search across all uploaded documents
     """
@@ -153,7 +246,9 @@ def semantic_search(query: str = None, limit: int = 5):
         if not query:
             raise HTTPException(status_code=400, detail="Query parameter is required")
             
-        results = vector_db_service.semantic_search(
+        results = await run_blocking(
+            "db",
+            vector_db_service.semantic_search,
             query=query,
             top_k=limit
         )
@@ -1,9 +1,9 @@
 """
 JIRA integration endpoints
 """
-from typing import Dict
-from fastapi import APIRouter, HTTPException, Path
-from app.models.schemas import JiraPushResponse, ComplianceMetrics
+from typing import Dict, Optional
+from fastapi import APIRouter, HTTPException, Path, Query
+from app.models.schemas import JiraPushResponse, ComplianceMetrics, ComplianceTestCasePage
 from app.services.jira_service import jira_service
 from app.services.database_service import database_service
 
@@ -62,3 +62,19 @@ def get_compliance_metrics():
         return ComplianceMetrics(**metrics)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to fetch compliance metrics: {e}")
+
+
+@router.get("/compliance-metrics/test-cases", response_model=ComplianceTestCasePage)
+def get_compliance_test_cases(
+    tag: Optional[str] = Query(None, description="Only test cases carrying this compliance tag"),
+    risk: Optional[str] = Query(None, description="Only test cases with this risk level"),
+    limit: int = Query(100, ge=1, le=1000),
+    offset: int = Query(0, ge=0)
+):
+    """
+    Get a page of test cases with their compliance tags and risk for filtering
+    """
+    try:
+        return database_service.get_compliance_test_cases(tag=tag, risk=risk, limit=limit, offset=offset)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to fetch compliance test cases: {e}")
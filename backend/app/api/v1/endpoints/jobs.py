@@ -0,0 +1,17 @@
+"""
+Background job status endpoints
+"""
+from fastapi import APIRouter, HTTPException, Path
+from app.models.schemas import JobStatus
+from app.services.job_service import job_service
+
+router = APIRouter()
+
+
+@router.get("/{job_id}", response_model=JobStatus)
+def get_job(job_id: str = Path(..., description="Job ID returned by an upload")):
+    """Get status, per-stage progress and timings of a background job"""
+    job = job_service.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
@@ -0,0 +1,52 @@
+"""
+Cache and runtime metrics endpoints
+"""
+from fastapi import APIRouter, HTTPException
+from app.services.vector_db_service import vector_db_service
+from app.services.content_index import content_index
+from app.services.database_service import database_service
+from app.services.ai_service import ai_service
+from app.services.ai_scheduler import ai_scheduler
+
+router = APIRouter()
+
+
+@router.get("/cache")
+def get_cache_metrics():
+    """Get hit/miss counters for the service caches"""
+    try:
+        return {
+            "vector_db": vector_db_service.cache_stats(),
+            "content_index": content_index.stats(),
+            "database_queries": database_service.cache_stats(),
+            "llm_responses": ai_service.cache_stats(),
+        }
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to fetch cache metrics: {e}")
+
+
+@router.get("/write-buffer")
+def get_write_buffer_metrics():
+    """Get pending and flushed counts of buffered status/description updates"""
+    try:
+        return database_service.write_buffer_stats()
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to fetch write buffer metrics: {e}")
+
+
+@router.get("/writes")
+def get_write_metrics():
+    """Get rows/sec and bytes appended to BigQuery per write transport"""
+    try:
+        return database_service.write_stats()
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to fetch write metrics: {e}")
+
+
+@router.get("/ai-scheduler")
+def get_ai_scheduler_metrics():
+    """Get in-flight count, queue depth and wait times per priority lane, plus retry/hedge counters, for AI calls"""
+    try:
+        return {"scheduler": ai_scheduler.stats(), "calls": ai_service.call_stats()}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to fetch AI scheduler metrics: {e}")
@@ -4,16 +4,23 @@ Requirements extraction and management endpoints
 import uuid
 from typing import List, Optional
 from datetime import datetime
-from fastapi import APIRouter, HTTPException, Path
+from fastapi import APIRouter, HTTPException, Path, Query
 from app.models.schemas import RequirementExtractionResponse, RequirementResponse
 from app.services.ai_service import ai_service
+from app.services.ai_scheduler import INTERACTIVE
+from app.services.document_service import document_service
+from app.core.config import settings
 from app.services.database_service import database_service
 
 router = APIRouter()
 
 
 @router.post("/{file_id}/extract", response_model=RequirementExtractionResponse)
-def extract_requirements(file_id: str = Path(..., description="ID returned by file upload")):
+def extract_requirements(
+    file_id: str = Path(..., description="ID returned by file upload"),
+    use_cache: bool = Query(True, description="Reuse cached AI responses for identical prompts"),
+    chunked: bool = Query(True, description="Extract documents longer than REQUIREMENT_CHUNK_TOKENS chunk by chunk")
+):
     """
     Extract requirements from uploaded file using AI
     """
@@ -23,8 +30,19 @@ def extract_requirements(file_id: str = Path(..., description="ID returned by fi
         if not extracted_data:
             raise HTTPException(status_code=404, detail="File not found or no extracted data")
         
-        # Extract requirements using AI
-        requirements = ai_service.extract_requirements_from_text(extracted_data)
+        # Extract requirements using AI; large documents are split along page boundaries
+        chunks = []
+        if chunked and settings.REQUIREMENT_CHUNK_TOKENS > 0:
+            chunks = document_service.chunk_pages(extracted_data, settings.REQUIREMENT_CHUNK_TOKENS * 4)
+        
+        if len(chunks) > 1:
+            requirements = ai_service.extract_requirements_chunked(
+                chunks, use_cache=use_cache, priority=INTERACTIVE
+            )
+        else:
+            requirements = ai_service.extract_requirements_from_text(
+                extracted_data, use_cache=use_cache, priority=INTERACTIVE
+            )
         
         if not requirements:
             raise HTTPException(status_code=422, detail="No requirements found by the AI service")
@@ -64,10 +82,10 @@ def extract_requirements(file_id: str = Path(..., description="ID returned by fi
 
 
 @router.get("/", response_model=List[RequirementResponse])
-def get_requirements():
-    """Get all requirements (no file_id dependency)"""
+def get_requirements(file_id: Optional[str] = Query(None, description="Only requirements of this file")):
+    """Get all requirements, or only those of one file"""
     try:
-        requirements = database_service.get_requirements()
+        requirements = database_service.get_requirements(file_id)
         return [RequirementResponse(**req) for req in requirements]
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to fetch requirements: {e}")
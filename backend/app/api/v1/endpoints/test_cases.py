@@ -4,24 +4,39 @@ Test case generation and management endpoints
 import json
 import time
 import uuid
-from typing import List, Dict, Any,Optional
+import queue
+import base64
+import threading
+from typing import Callable, Iterator, List, Dict, Any, Optional, Tuple
 from datetime import datetime
-from concurrent.futures import ThreadPoolExecutor, as_completed
-from fastapi import APIRouter, HTTPException, Path, Body
+from collections import defaultdict
+from concurrent.futures import as_completed
+from fastapi import APIRouter, HTTPException, Path, Body, Query, Response
+from fastapi.responses import StreamingResponse
 from app.models.schemas import (
     TestCaseGenerationResponse, 
     TestCaseResponse, 
-    ImproveTestCaseRequest
+    ImproveTestCaseRequest,
+    GenerationStatus,
+    RequirementGenerationStatus
 )
 from app.services.ai_service import ai_service
+from app.services.ai_scheduler import INTERACTIVE
 from app.services.database_service import database_service
+from app.services.write_behind import BatchAppender
 from app.core.config import settings
+from app.core.executors import get_executor
+from app.core.exceptions import DatabaseError
 
 router = APIRouter()
 
 
 @router.post("/generate/file/{file_id}", response_model=TestCaseGenerationResponse)
-def generate_test_cases_for_file(file_id: str = Path(..., description="File ID to generate test cases for")):
+def generate_test_cases_for_file(
+    file_id: str = Path(..., description="File ID to generate test cases for"),
+    use_cache: bool = Query(True, description="Reuse cached AI responses for identical prompts"),
+    batched: Optional[bool] = Query(None, description="Pack several requirements into each prompt (default: TEST_CASE_BATCHING)")
+):
     """
     Generate test cases for all requirements in a file
     """
@@ -33,91 +48,90 @@ def generate_test_cases_for_file(file_id: str = Path(..., description="File ID t
         if not requirements:
             raise HTTPException(status_code=404, detail="No requirements found for that file_id")
         
-        per_requirement = {}
-        all_test_cases = []
-        start_time = time.time()
-        
-        # Generate test cases in parallel
-        with ThreadPoolExecutor(max_workers=settings.MAX_WORKERS) as executor:
-            future_map = {
-                executor.submit(
-                    ai_service.generate_test_cases, 
-                    req["title"], 
-                    req["description"], 
-                    input_data
-                ): req 
-                for req in requirements
-            }
-            
-            for fut in as_completed(future_map):
-                req = future_map[fut]
-                req_id = req["requirement_id"]
-                
-                try:
-                    tests = fut.result(timeout=60)
-                except Exception as e:
-                    per_requirement[req_id] = {
-                        "status": "error", 
-                        "error": str(e), 
-                        "generated": 0
-                    }
-                    continue
-                
-                if not tests:
-                    per_requirement[req_id] = {
-                        "status": "empty", 
-                        "error": "No test cases", 
-                        "generated": 0
-                    }
-                    continue
-                
-                # Process test cases
-                test_cases = []
-                input_examples = []
-                
-                for i, t in enumerate(tests, start=1):
-                    input_value = _extract_input_from_test(t)
-                    tc = {
-                        "id": str(uuid.uuid4()),
-                        "file_id": file_id,
-                        "req_id": req_id,
-                        "req_title_id": req["req_title_id"],
-                        "req_title": req["title"],
-                        "req_description": req["description"],
-                        "tc_id": t.get("test_id") or f"TC-{i:03d}",
-                        "tc_title": t.get("title") or "",
-                        "tc_description": t.get("description") or "",
-                        "expected_result": t.get("expected_result") or "",
-                        "input_data": json.dumps(t.get("input_data", {})),
-                        "compliance_tags": ",".join(t.get("compliance", [])) if isinstance(t.get("compliance", []), list) else "",
-                        "risk": t.get("risk", "Low"),
-                        "created_at": datetime.now().isoformat()
-                    }
-                    test_cases.append(tc)
-                    
-                    if input_value:
-                        input_examples.append(input_value)
-                
-                all_test_cases.extend(test_cases)
-                per_requirement[req_id] = {
-                    "status": "ok",
-                    "generated": len(test_cases),
-                    "title": req["title"],
-                    "input_examples": list(dict.fromkeys(input_examples))[:settings.INPUT_EXAMPLES_PER_REQ]
-                }
+        return _generate_for_requirements(
+            file_id, requirements, input_data, use_cache=use_cache, batched=_batching(batched)
+        )
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Test case generation failed: {e}")
+
+
+@router.post("/generate/file/{file_id}/resume", response_model=TestCaseGenerationResponse)
+def resume_test_case_generation(
+    file_id: str = Path(..., description="File ID to resume generation for"),
+    use_cache: bool = Query(True, description="Reuse cached AI responses for identical prompts"),
+    batched: Optional[bool] = Query(None, description="Pack several requirements into each prompt (default: TEST_CASE_BATCHING)")
+):
+    """
+    Generate test cases only for requirements that failed or were never
+    completed in an earlier run
+    """
+    try:
+        requirements = database_service.get_requirements(file_id)
         
-        # Save test cases to database
-        if all_test_cases:
-            database_service.save_test_cases(all_test_cases)
-            database_service.update_file_status(file_id, "Test Cases Generated")
+        if not requirements:
+            raise HTTPException(status_code=404, detail="No requirements found for that file_id")
+        
+        completed = {
+            row["requirement_id"]
+            for row in database_service.get_generation_status(file_id)
+            if row["status"] == "done"
+        }
+        pending = [req for req in requirements if req["requirement_id"] not in completed]
         
-        elapsed = round(time.time() - start_time, 2)
+        if not pending:
+            return TestCaseGenerationResponse(
+                message=f"All {len(requirements)} requirements already have test cases",
+                total_testcases_generated=0,
+                elapsed_seconds=0.0,
+                per_requirement={}
+            )
         
-        return TestCaseGenerationResponse(
-            message=f"Generated {len(all_test_cases)} test cases for {len(requirements)} requirements",
-            total_testcases_generated=len(all_test_cases),
-            elapsed_seconds=elapsed,
-            per_requirement=per_requirement
+        input_data = database_service.get_input_data(file_id)
+        return _generate_for_requirements(
+            file_id, pending, input_data, total_requirements=len(requirements),
+            use_cache=use_cache, batched=_batching(batched)
+        )
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Resuming test case generation failed: {e}")
+
+
+@router.post("/generate/file/{file_id}/stream")
+def stream_test_case_generation(
+    file_id: str = Path(..., description="File ID to generate test cases for"),
+    use_cache: bool = Query(True, description="Reuse cached AI responses for identical prompts"),
+    batched: Optional[bool] = Query(None, description="Pack several requirements into each prompt (default: TEST_CASE_BATCHING)")
+):
+    """
+    Generate test cases for all requirements in a file, streaming progress
+    as server-sent events:
+
+    - `test_case`: one test case, as soon as it is parsed from the model's streamed answer
+    - `requirement`: a requirement finished, with its status and test case count
+    - `saved`: test cases of these requirements were written
+    - `done`: the same summary the non-streaming endpoint returns
+    - `error`: generation failed; nothing follows
+
+    Streamed test cases are previews; the `requirement` event follows once
+    the full answer has been validated. Generation keeps running and saving
+    if the client disconnects.
+    """
+    try:
+        input_data = database_service.get_input_data(file_id)
+        requirements = database_service.get_requirements(file_id)
+        
+        if not requirements:
+            raise HTTPException(status_code=404, detail="No requirements found for that file_id")
+        
+        return StreamingResponse(
+            _stream_events(file_id, requirements, input_data, use_cache, _batching(batched)),
+            media_type="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
         )
         
     except HTTPException:
@@ -126,15 +140,317 @@ def generate_test_cases_for_file(file_id: str = Path(..., description="File ID t
         raise HTTPException(status_code=500, detail=f"Test case generation failed: {e}")
 
 
+@router.get("/generate/file/{file_id}/status", response_model=GenerationStatus)
+def get_generation_status(file_id: str = Path(..., description="File ID")):
+    """
+    Get per-requirement generation status from the saved checkpoints
+    """
+    try:
+        rows = database_service.get_generation_status(file_id)
+        
+        if not rows:
+            raise HTTPException(status_code=404, detail="No requirements found for that file_id")
+        
+        counts = {"done": 0, "error": 0, "empty": 0, "pending": 0}
+        for row in rows:
+            counts[row["status"]] = counts.get(row["status"], 0) + 1
+        
+        return GenerationStatus(
+            file_id=file_id,
+            total=len(rows),
+            done=counts["done"],
+            failed=counts["error"] + counts["empty"],
+            pending=counts["pending"],
+            requirements=[RequirementGenerationStatus(**row) for row in rows]
+        )
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to fetch generation status: {e}")
+
+
+def _generate_for_requirements(
+    file_id: str,
+    requirements: List[Dict],
+    input_data: str,
+    total_requirements: Optional[int] = None,
+    use_cache: bool = True,
+    batched: bool = False,
+    on_event: Optional[Callable[[str, Dict], None]] = None,
+) -> TestCaseGenerationResponse:
+    """
+    Generate and persist test cases for the given requirements. Every
+    requirement gets a checkpoint row once its test cases are saved (or
+    once it fails), which is what resume uses to skip finished work.
+    on_event(name, data) receives the progress events of the stream endpoint.
+    """
+    # Only the stream endpoint streams model responses; other runs keep hedged calls
+    stream_to = on_event
+    on_event = on_event or (lambda name, data: None)
+    run_id = str(uuid.uuid4())
+    total_requirements = total_requirements or len(requirements)
+    already_done = total_requirements - len(requirements)
+    per_requirement = {}
+    failures = []
+    total_generated = 0
+    start_time = time.time()
+    
+    # Test cases are written in micro-batches while generation continues,
+    # and the file status tracks how many requirements are persisted
+    persisted_reqs = set()
+    
+    def on_flush(batch: List[Dict]):
+        # One requirement's test cases are always written in the same batch
+        generated = defaultdict(int)
+        for tc in batch:
+            generated[tc["req_id"]] += 1
+        persisted_reqs.update(generated)
+        on_event("saved", {"requirements": dict(generated), "saved": already_done + len(persisted_reqs)})
+        _record_checkpoints(file_id, run_id, [
+            {"req_id": req_id, "status": "done", "generated": count}
+            for req_id, count in generated.items()
+        ])
+        database_service.update_file_status(
+            file_id,
+            f"Generating Test Cases ({already_done + len(persisted_reqs)}/{total_requirements} requirements saved)"
+        )
+    
+    appender = BatchAppender(
+        database_service.save_test_cases,
+        batch_size=settings.TEST_CASE_FLUSH_ROWS,
+        flush_interval=settings.TEST_CASE_FLUSH_SECONDS,
+        on_flush=on_flush,
+        max_pending=settings.MAX_WORKERS * 2,
+        name=f"test-case-writer-{file_id}",
+    )
+    
+    try:
+        # Batched mode packs several requirements into one prompt
+        if batched:
+            units = ai_service.plan_test_case_batches(requirements, input_data)
+        else:
+            units = [[req] for req in requirements]
+        
+        # Generate test cases in parallel on the shared AI pool; the scheduler caps calls in flight
+        executor = get_executor("ai")
+        future_map = {
+            executor.submit(_generate_unit, unit, input_data, use_cache, stream_to): unit
+            for unit in units
+        }
+        
+        for req, tests in _completed_requirements(future_map):
+            req_id = req["requirement_id"]
+            
+            if isinstance(tests, Exception):
+                per_requirement[req_id] = {
+                    "status": "error", 
+                    "error": str(tests), 
+                    "generated": 0
+                }
+                failures.append({"req_id": req_id, "status": "error", "error": str(tests)})
+                on_event("requirement", {"req_id": req_id, **per_requirement[req_id]})
+                continue
+            
+            if not tests:
+                per_requirement[req_id] = {
+                    "status": "empty", 
+                    "error": "No test cases", 
+                    "generated": 0
+                }
+                failures.append({"req_id": req_id, "status": "empty", "error": "No test cases"})
+                on_event("requirement", {"req_id": req_id, **per_requirement[req_id]})
+                continue
+            
+            # Process test cases
+            test_cases = []
+            input_examples = []
+            
+            for i, t in enumerate(tests, start=1):
+                input_value = _extract_input_from_test(t)
+                tc = {
+                    "id": str(uuid.uuid4()),
+                    "file_id": file_id,
+                    "req_id": req_id,
+                    "req_title_id": req["req_title_id"],
+                    "req_title": req["title"],
+                    "req_description": req["description"],
+                    "tc_id": t.get("test_id") or f"TC-{i:03d}",
+                    "tc_title": t.get("title") or "",
+                    "tc_description": t.get("description") or "",
+                    "expected_result": t.get("expected_result") or "",
+                    "input_data": json.dumps(t.get("input_data", {})),
+                    "compliance_tags": ",".join(t.get("compliance", [])) if isinstance(t.get("compliance", []), list) else "",
+                    "risk": t.get("risk", "Low"),
+                    "created_at": datetime.now().isoformat()
+                }
+                test_cases.append(tc)
+                
+                if input_value:
+                    input_examples.append(input_value)
+            
+            try:
+                appender.add(test_cases)
+            except RuntimeError:
+                # Storage is failing; stop paying for generations that can't be saved
+                for pending in future_map:
+                    pending.cancel()
+                break
+            total_generated += len(test_cases)
+            per_requirement[req_id] = {
+                "status": "ok",
+                "generated": len(test_cases),
+                "title": req["title"],
+                "input_examples": list(dict.fromkeys(input_examples))[:settings.INPUT_EXAMPLES_PER_REQ]
+            }
+            on_event("requirement", {"req_id": req_id, **per_requirement[req_id]})
+    except Exception:
+        # Still persist what was generated before the failure
+        try:
+            appender.close()
+        except RuntimeError:
+            pass
+        _record_checkpoints(file_id, run_id, failures)
+        raise
+    
+    _record_checkpoints(file_id, run_id, failures)
+    
+    try:
+        saved = appender.close()
+    except RuntimeError as e:
+        database_service.update_file_status(
+            file_id,
+            f"Test Cases Partially Generated ({already_done + len(persisted_reqs)}/{total_requirements} requirements saved)"
+        )
+        raise DatabaseError(f"Failed to save test cases: {e}")
+    
+    if saved:
+        database_service.update_file_status(
+            file_id,
+            "Test Cases Generated" if not failures else
+            f"Test Cases Partially Generated ({already_done + len(persisted_reqs)}/{total_requirements} requirements saved)"
+        )
+    
+    elapsed = round(time.time() - start_time, 2)
+    
+    return TestCaseGenerationResponse(
+        message=f"Generated {total_generated} test cases for {len(requirements)} requirements",
+        total_testcases_generated=total_generated,
+        elapsed_seconds=elapsed,
+        per_requirement=per_requirement
+    )
+
+
+def _batching(batched: Optional[bool]) -> bool:
+    return settings.TEST_CASE_BATCHING if batched is None else batched
+
+
+def _generate_unit(
+    requirements: List[Dict],
+    input_data: str,
+    use_cache: bool,
+    on_event: Optional[Callable[[str, Dict], None]] = None,
+) -> Dict[str, Any]:
+    """
+    Generate test cases for one requirement, or for a batch with a single
+    prompt. With on_event, a single requirement's response is streamed and
+    each test case is sent to it as soon as it is parsed.
+    """
+    if len(requirements) == 1:
+        req = requirements[0]
+        on_test_case = None
+        if on_event:
+            on_test_case = lambda index, tc: on_event(
+                "test_case", {"req_id": req["requirement_id"], "index": index, "test_case": tc}
+            )
+        tests = ai_service.generate_test_cases(
+            req["title"], req["description"], input_data, use_cache, on_test_case=on_test_case
+        )
+        return {req["requirement_id"]: tests}
+    return ai_service.generate_test_cases_batch(requirements, input_data, use_cache=use_cache)
+
+
+def _stream_events(
+    file_id: str, requirements: List[Dict], input_data: str, use_cache: bool, batched: bool
+) -> Iterator[str]:
+    """Run generation on a background thread and yield its events in SSE format"""
+    events: queue.Queue = queue.Queue()
+    
+    def run():
+        try:
+            result = _generate_for_requirements(
+                file_id, requirements, input_data, use_cache=use_cache, batched=batched,
+                on_event=lambda name, data: events.put((name, data))
+            )
+            events.put(("done", result.model_dump()))
+        except Exception as e:
+            events.put(("error", {"detail": f"Test case generation failed: {e}"}))
+        events.put(None)
+    
+    threading.Thread(target=run, name=f"test-case-stream-{file_id}", daemon=True).start()
+    yield _sse("start", {"file_id": file_id, "requirements": len(requirements)})
+    while True:
+        try:
+            event = events.get(timeout=settings.SSE_KEEPALIVE_SECONDS)
+        except queue.Empty:
+            # Comment line keeps proxies from closing an idle connection
+            yield ": keep-alive\n\n"
+            continue
+        if event is None:
+            return
+        yield _sse(*event)
+
+
+def _sse(event: str, data: Dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, default=_json_default)}\n\n"
+
+
+def _completed_requirements(future_map: Dict) -> Iterator[Tuple[Dict, Any]]:
+    """Yield (requirement, test cases or the exception raised for it) as generation units finish"""
+    for fut in as_completed(future_map):
+        unit = future_map[fut]
+        try:
+            # Already done; the per-call deadline is enforced inside ai_service
+            results = fut.result()
+        except Exception as e:
+            results = {req["requirement_id"]: e for req in unit}
+        for req in unit:
+            yield req, results.get(req["requirement_id"], [])
+
+
+def _record_checkpoints(file_id: str, run_id: str, checkpoints: List[Dict]):
+    """Save generation checkpoints; a lost checkpoint only means resume re-checks saved test cases"""
+    if not checkpoints:
+        return
+    now = datetime.now().isoformat()
+    try:
+        database_service.save_generation_checkpoints([
+            {
+                "file_id": file_id,
+                "req_id": cp["req_id"],
+                "run_id": run_id,
+                "status": cp["status"],
+                "generated": cp.get("generated", 0),
+                "error": cp.get("error"),
+                "created_at": now,
+            }
+            for cp in checkpoints
+        ])
+    except Exception as e:
+        print(f"Failed to save generation checkpoints for {file_id}: {e}")
+
+
 @router.post("/generate/requirement/{requirement_id}")
-def generate_test_cases_for_requirement(requirement_id: str = Path(..., description="Requirement ID")):
+def generate_test_cases_for_requirement(
+    requirement_id: str = Path(..., description="Requirement ID"),
+    use_cache: bool = Query(True, description="Reuse cached AI responses for identical prompts")
+):
     """
     Generate test cases for a single requirement
     """
     try:
         # Get requirement details
-        requirements = database_service.get_requirements()
-        req = next((r for r in requirements if r["requirement_id"] == requirement_id), None)
+        req = database_service.get_requirement_by_id(requirement_id)
         
         if not req:
             raise HTTPException(status_code=404, detail="Requirement not found")
@@ -143,7 +459,9 @@ def generate_test_cases_for_requirement(requirement_id: str = Path(..., descript
         input_data = database_service.get_input_data(req["file_id"])
         
         # Generate test cases
-        tests = ai_service.generate_test_cases(req["title"], req["description"], input_data)
+        tests = ai_service.generate_test_cases(
+            req["title"], req["description"], input_data, use_cache=use_cache, priority=INTERACTIVE
+        )
         
         if not tests:
             raise HTTPException(status_code=422, detail="No test cases generated by AI model")
@@ -183,22 +501,76 @@ def generate_test_cases_for_requirement(requirement_id: str = Path(..., descript
         raise HTTPException(status_code=500, detail=f"Test case generation failed: {e}")
 
 @router.get("/")
-def get_all_test_cases():
-    """Get a flat list of all test cases across all files (no file_id required)
-    This endpoint helps the frontend fetch test cases without passing file_id.
+def get_all_test_cases(
+    response: Response,
+    limit: Optional[int] = Query(None, ge=1, description="Page size in json mode; without limit and cursor all rows are returned"),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor value from the previous page"),
+    fields: Optional[str] = Query(None, description="Comma-separated columns to return; req_id and tc_id are always included"),
+    format: str = Query("json", pattern="^(json|ndjson)$", description="json page or streamed ndjson")
+):
+    """Get test cases across all files, ordered by (req_id, tc_id).
+
+    json mode without `limit` or `cursor` returns every row, as before paging existed.
+    With either, it returns one page as an array and sets X-Next-Cursor when more rows exist.
+    ndjson mode streams rows batch by batch as they are read, up to `limit` if given.
     """
     try:
-        return database_service.get_all_test_cases()
+        after = _decode_cursor(cursor) if cursor else None
+        field_list = [f.strip() for f in fields.split(",") if f.strip()] if fields else None
+        
+        if format == "ndjson":
+            batches = database_service.iter_test_case_batches(field_list, after, limit)
+            return StreamingResponse(
+                (
+                    "".join(json.dumps(row, default=_json_default) + "\n" for row in batch)
+                    for batch in batches
+                ),
+                media_type="application/x-ndjson"
+            )
+        
+        if limit is None and cursor is None:
+            if not field_list:
+                return database_service.get_all_test_cases()
+            return [
+                row
+                for batch in database_service.iter_test_case_batches(field_list)
+                for row in batch
+            ]
+        
+        page_size = min(limit or settings.TEST_CASES_PAGE_SIZE, settings.TEST_CASES_MAX_PAGE_SIZE)
+        rows, next_key = database_service.get_test_cases_page(field_list, after, page_size)
+        if next_key:
+            response.headers["X-Next-Cursor"] = _encode_cursor(next_key)
+        return rows
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to fetch all test cases: {e}")
 
 
+@router.get("/file/{file_id}")
+def get_test_cases_for_file(file_id: str = Path(..., description="File ID")):
+    """Get test cases of one file grouped by requirement"""
+    try:
+        return database_service.get_test_cases_by_file(file_id)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to fetch test cases for file: {e}")
+
+
 @router.post("/improve")
-def improve_test_case(request: ImproveTestCaseRequest = Body(...)):
+def improve_test_case(
+    request: ImproveTestCaseRequest = Body(...),
+    use_cache: bool = Query(True, description="Reuse cached AI responses for identical prompts")
+):
     """
     Improve a test case description based on user feedback and update it in BigQuery
     """
     try:
+        if not database_service.get_requirement_by_id(request.requirement_id):
+            raise HTTPException(status_code=404, detail="Requirement not found")
+
         # Fetch original description using database_service
         original_description = database_service.get_test_case_description(
             request.requirement_id,
@@ -211,14 +583,16 @@ def improve_test_case(request: ImproveTestCaseRequest = Body(...)):
         # Use AI to improve description
         improved_description = ai_service.improve_test_case(
             original_description,
-            request.user_input
+            request.user_input,
+            use_cache=use_cache
         )
 
         # Update improved description in BigQuery using the service method
         database_service.update_test_case_description(
             request.requirement_id,
             request.tc_id,
-            improved_description
+            improved_description,
+            wait=True
         )
 
         return {
@@ -234,6 +608,27 @@ def improve_test_case(request: ImproveTestCaseRequest = Body(...)):
         raise HTTPException(status_code=500, detail=f"Failed to improve and update test case: {e}")
 
 
+def _encode_cursor(key: Tuple[str, str, int]) -> str:
+    """Encode a (req_id, tc_id, row_seq) keyset position as an opaque cursor"""
+    return base64.urlsafe_b64encode(json.dumps(list(key)).encode("utf-8")).decode("ascii")
+
+
+def _decode_cursor(cursor: str) -> Tuple[str, str, int]:
+    try:
+        key = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        # Cursors issued before row_seq existed resume after the first row of their key
+        req_id, tc_id, row_seq = key if len(key) == 3 else (*key, 1)
+        return str(req_id), str(tc_id), int(row_seq)
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+
+def _json_default(value: Any):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value)
+
+
 def _extract_input_from_test(test_case: Dict) -> str:
     """Extract input data from test case"""
     if not isinstance(test_case, dict):
@@ -0,0 +1,212 @@
+"""
+In-process and local persistent caches shared by the services
+"""
+import os
+import json
+import time
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+
+class LRUCache:
+    """
+    Thread-safe, size-bounded in-process LRU cache with hit/miss counters.
+    Entries optionally expire ttl_seconds after they were stored.
+    """
+
+    def __init__(self, max_size: int, ttl_seconds: Optional[float] = None):
+        self.max_size = max(1, max_size)
+        self.ttl_seconds = ttl_seconds
+        self._data: "OrderedDict[Hashable, Tuple[Optional[float], Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at is None or expires_at > time.monotonic():
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._data[key]
+                self.expirations += 1
+            self.misses += 1
+            return default
+
+    def set(self, key: Hashable, value: Any):
+        expires_at = time.monotonic() + self.ttl_seconds if self.ttl_seconds else None
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, predicate: Callable[[Hashable], bool]) -> int:
+        """Drop every entry whose key matches predicate; returns the number dropped"""
+        with self._lock:
+            stale = [key for key in self._data if predicate(key)]
+            for key in stale:
+                del self._data[key]
+            return len(stale)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._data),
+                "max_size": self.max_size,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+
+class SQLiteStore:
+    """
+    Local persistent key/value store backed by SQLite.
+    Values are stored as JSON so entries survive process restarts.
+    Entries optionally expire ttl_seconds after they were stored, and with
+    max_entries the oldest entries are evicted once the table is full.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        table: str = "entries",
+        ttl_seconds: Optional[float] = None,
+        max_entries: Optional[int] = None,
+    ):
+        self.path = path
+        self.table = table
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            f"CREATE TABLE IF NOT EXISTS {self.table} "
+            "(key TEXT PRIMARY KEY, value TEXT NOT NULL, stored_at REAL NOT NULL DEFAULT 0)"
+        )
+        columns = {row[1] for row in self._conn.execute(f"PRAGMA table_info({self.table})")}
+        if "stored_at" not in columns:
+            # Stores created before expiry support; their entries count as stored at epoch 0
+            self._conn.execute(f"ALTER TABLE {self.table} ADD COLUMN stored_at REAL NOT NULL DEFAULT 0")
+        self._conn.execute(
+            f"CREATE INDEX IF NOT EXISTS {self.table}_stored_at ON {self.table} (stored_at)"
+        )
+        self._conn.commit()
+
+    def _cutoff(self) -> float:
+        return time.time() - self.ttl_seconds if self.ttl_seconds else float("-inf")
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT value, stored_at FROM {self.table} WHERE key = ?", (key,)
+            ).fetchone()
+            if row is not None and row[1] < self._cutoff():
+                self._conn.execute(f"DELETE FROM {self.table} WHERE key = ?", (key,))
+                self._conn.commit()
+                self.expirations += 1
+                row = None
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        return json.loads(row[0])
+
+    def get_many(self, keys: list) -> Dict[str, Any]:
+        """Fetch several keys in one round-trip; missing keys are omitted"""
+        if not keys:
+            return {}
+        found = {}
+        with self._lock:
+            # Stay below SQLite's bound-parameter limit
+            for start in range(0, len(keys), 500):
+                part = keys[start:start + 500]
+                placeholders = ",".join("?" for _ in part)
+                rows = self._conn.execute(
+                    f"SELECT key, value FROM {self.table} WHERE key IN ({placeholders}) AND stored_at >= ?",
+                    part + [self._cutoff()]
+                ).fetchall()
+                found.update({k: v for k, v in rows})
+            self.hits += len(found)
+            self.misses += len(set(keys)) - len(found)
+        return {k: json.loads(v) for k, v in found.items()}
+
+    def set(self, key: str, value: Any):
+        self.set_many({key: value})
+
+    def set_many(self, items: Dict[str, Any]):
+        if not items:
+            return
+        now = time.time()
+        payload = [(k, json.dumps(v), now) for k, v in items.items()]
+        with self._lock:
+            self._conn.executemany(
+                f"INSERT OR REPLACE INTO {self.table} (key, value, stored_at) VALUES (?, ?, ?)", payload
+            )
+            if self.max_entries:
+                self.evictions += self._conn.execute(
+                    f"DELETE FROM {self.table} WHERE key NOT IN "
+                    f"(SELECT key FROM {self.table} ORDER BY stored_at DESC LIMIT ?)",
+                    (self.max_entries,)
+                ).rowcount
+            self._conn.commit()
+
+    def delete(self, key: str):
+        with self._lock:
+            self._conn.execute(f"DELETE FROM {self.table} WHERE key = ?", (key,))
+            self._conn.commit()
+
+    def purge_expired(self) -> int:
+        """Delete expired entries; returns the number deleted"""
+        if not self.ttl_seconds:
+            return 0
+        with self._lock:
+            deleted = self._conn.execute(
+                f"DELETE FROM {self.table} WHERE stored_at < ?", (self._cutoff(),)
+            ).rowcount
+            self._conn.commit()
+            self.expirations += deleted
+            return deleted
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            size = self._conn.execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()[0]
+            lookups = self.hits + self.misses
+            return {
+                "path": self.path,
+                "size": size,
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
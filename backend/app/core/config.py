@@ -42,6 +42,16 @@ class Settings(BaseSettings):
     
     # BigQuery settings
     BIGQUERY_DATASET: str = "test_cases"
+    # Create missing tables (partitioned/clustered) at startup
+    BIGQUERY_ENSURE_TABLES: bool = os.getenv("BIGQUERY_ENSURE_TABLES", "false").lower() == "true"
+    # Append transport: "auto" streams small batches and uses load jobs for bulk writes
+    BIGQUERY_WRITE_TRANSPORT: str = os.getenv("BIGQUERY_WRITE_TRANSPORT", "auto")  # "auto", "stream" or "load"
+    BIGQUERY_LOAD_MIN_ROWS: int = int(os.getenv("BIGQUERY_LOAD_MIN_ROWS", "5000"))
+    BIGQUERY_LOAD_MIN_BYTES: int = int(os.getenv("BIGQUERY_LOAD_MIN_BYTES", str(20 * 1024 * 1024)))
+    BIGQUERY_STREAM_CHUNK_ROWS: int = int(os.getenv("BIGQUERY_STREAM_CHUNK_ROWS", "500"))
+    BIGQUERY_STREAM_CHUNK_BYTES: int = int(os.getenv("BIGQUERY_STREAM_CHUNK_BYTES", str(5 * 1024 * 1024)))
+    BIGQUERY_STREAM_MAX_ATTEMPTS: int = int(os.getenv("BIGQUERY_STREAM_MAX_ATTEMPTS", "4"))
+    BIGQUERY_LOAD_MAX_ATTEMPTS: int = int(os.getenv("BIGQUERY_LOAD_MAX_ATTEMPTS", "3"))
     
     # PostgreSQL settings
     POSTGRES_HOST: str = os.getenv("POSTGRES_HOST", "IP_ADDRESS")
@@ -63,6 +73,96 @@ class Settings(BaseSettings):
     MAX_JIRA_WORKERS: int = 5
     INPUT_EXAMPLES_PER_REQ: int = 3
     
+    # Shared AI call scheduler; size the rate limit to the Gemini quota
+    AI_MAX_IN_FLIGHT: int = int(os.getenv("AI_MAX_IN_FLIGHT", "8"))
+    AI_RATE_LIMIT_PER_MINUTE: float = float(os.getenv("AI_RATE_LIMIT_PER_MINUTE", "300"))  # 0 disables
+    AI_RATE_LIMIT_BURST: int = int(os.getenv("AI_RATE_LIMIT_BURST", "10"))
+    AI_EXECUTOR_WORKERS: int = int(os.getenv("AI_EXECUTOR_WORKERS", "32"))
+    # Interactive fan-out (chunked extraction for a request) gets its own pool so it never queues behind bulk work
+    AI_INTERACTIVE_EXECUTOR_WORKERS: int = int(os.getenv("AI_INTERACTIVE_EXECUTOR_WORKERS", "8"))
+    # Batched test case prompts; token counts are estimated at ~4 characters per token
+    TEST_CASE_BATCHING: bool = os.getenv("TEST_CASE_BATCHING", "false").lower() == "true"
+    AI_BATCH_MAX_REQUIREMENTS: int = int(os.getenv("AI_BATCH_MAX_REQUIREMENTS", "8"))
+    AI_BATCH_INPUT_TOKENS: int = int(os.getenv("AI_BATCH_INPUT_TOKENS", "24000"))
+    AI_BATCH_OUTPUT_TOKENS: int = int(os.getenv("AI_BATCH_OUTPUT_TOKENS", "7000"))
+    AI_TEST_CASE_OUTPUT_TOKENS: int = int(os.getenv("AI_TEST_CASE_OUTPUT_TOKENS", "1500"))  # expected per requirement
+    # Documents longer than REQUIREMENT_CHUNK_TOKENS (~4 characters per token) are
+    # extracted chunk by chunk along page boundaries and the results merged
+    REQUIREMENT_CHUNK_TOKENS: int = int(os.getenv("REQUIREMENT_CHUNK_TOKENS", "12000"))  # 0 disables
+    REQUIREMENT_EXTRACTION_PARALLELISM: int = int(os.getenv("REQUIREMENT_EXTRACTION_PARALLELISM", "4"))
+    REQUIREMENT_DEDUP_SIMILARITY: float = float(os.getenv("REQUIREMENT_DEDUP_SIMILARITY", "0.8"))
+    # Per-attempt timeout, overall deadline and retries of Gemini calls
+    AI_CALL_TIMEOUT_SECONDS: float = float(os.getenv("AI_CALL_TIMEOUT_SECONDS", "60"))
+    AI_CALL_DEADLINE_SECONDS: float = float(os.getenv("AI_CALL_DEADLINE_SECONDS", "180"))
+    AI_MAX_ATTEMPTS: int = int(os.getenv("AI_MAX_ATTEMPTS", "4"))
+    AI_BACKOFF_BASE_SECONDS: float = float(os.getenv("AI_BACKOFF_BASE_SECONDS", "1"))
+    AI_BACKOFF_MAX_SECONDS: float = float(os.getenv("AI_BACKOFF_MAX_SECONDS", "20"))
+    # Hedge an attempt once it runs past this percentile of recent latencies (0 disables)
+    AI_HEDGE_PERCENTILE: float = float(os.getenv("AI_HEDGE_PERCENTILE", "0"))
+    AI_HEDGE_MAX_FRACTION: float = float(os.getenv("AI_HEDGE_MAX_FRACTION", "0.1"))
+    AI_LATENCY_WINDOW: int = int(os.getenv("AI_LATENCY_WINDOW", "200"))
+
+    # Background job settings
+    JOB_WORKERS: int = int(os.getenv("JOB_WORKERS", "4"))
+    JOB_QUEUE_SIZE: int = int(os.getenv("JOB_QUEUE_SIZE", "16"))
+    JOB_STORE: str = os.getenv("JOB_STORE", "memory")  # "memory" or "sqlite"
+    # Job records are dropped this long after their last update, oldest first beyond JOB_MAX_RETAINED
+    JOB_RETENTION_SECONDS: float = float(os.getenv("JOB_RETENTION_SECONDS", "86400"))  # 0 keeps them
+    JOB_MAX_RETAINED: int = int(os.getenv("JOB_MAX_RETAINED", "1000"))
+
+    # Executors for blocking calls made from async endpoints
+    DB_EXECUTOR_WORKERS: int = int(os.getenv("DB_EXECUTOR_WORKERS", "16"))
+
+    # Document parsing settings
+    UPLOAD_READ_CHUNK_SIZE: int = int(os.getenv("UPLOAD_READ_CHUNK_SIZE", str(1024 * 1024)))
+    PDF_PROCESS_WORKERS: int = int(os.getenv("PDF_PROCESS_WORKERS", "2"))
+    PDF_PARALLEL_MIN_PAGES: int = int(os.getenv("PDF_PARALLEL_MIN_PAGES", "50"))
+    PDF_PAGES_PER_TASK: int = int(os.getenv("PDF_PAGES_PER_TASK", "25"))
+
+    # Vector store ingest settings
+    EMBEDDING_BATCH_SIZE: int = int(os.getenv("EMBEDDING_BATCH_SIZE", "64"))
+
+    # List endpoint settings
+    TEST_CASES_PAGE_SIZE: int = int(os.getenv("TEST_CASES_PAGE_SIZE", "1000"))
+    TEST_CASES_MAX_PAGE_SIZE: int = int(os.getenv("TEST_CASES_MAX_PAGE_SIZE", "10000"))
+    TEST_CASES_STREAM_PAGE_SIZE: int = int(os.getenv("TEST_CASES_STREAM_PAGE_SIZE", "5000"))
+
+    # Micro-batch persistence of generated test cases
+    TEST_CASE_FLUSH_ROWS: int = int(os.getenv("TEST_CASE_FLUSH_ROWS", "200"))
+    TEST_CASE_FLUSH_SECONDS: float = float(os.getenv("TEST_CASE_FLUSH_SECONDS", "5"))
+    # Idle interval before the generation event stream sends a keep-alive comment
+    SSE_KEEPALIVE_SECONDS: float = float(os.getenv("SSE_KEEPALIVE_SECONDS", "15"))
+    # Versioned test case storage
+    TEST_CASE_MERGE_CHUNK_ROWS: int = int(os.getenv("TEST_CASE_MERGE_CHUNK_ROWS", "500"))
+    TEST_CASE_HISTORY_RETENTION_HOURS: float = float(os.getenv("TEST_CASE_HISTORY_RETENTION_HOURS", "168"))
+    TEST_CASE_COMPACTION_INTERVAL_HOURS: float = float(os.getenv("TEST_CASE_COMPACTION_INTERVAL_HOURS", "24"))
+
+    # Write-behind settings for status/description updates
+    WRITE_BEHIND_FLUSH_SECONDS: float = float(os.getenv("WRITE_BEHIND_FLUSH_SECONDS", "2"))
+    WRITE_BEHIND_MAX_ATTEMPTS: int = int(os.getenv("WRITE_BEHIND_MAX_ATTEMPTS", "5"))
+    WRITE_BEHIND_WAIT_TIMEOUT_SECONDS: float = float(os.getenv("WRITE_BEHIND_WAIT_TIMEOUT_SECONDS", "30"))
+
+    # Query cache settings
+    QUERY_CACHE_SIZE: int = int(os.getenv("QUERY_CACHE_SIZE", "256"))
+    QUERY_CACHE_TTL_SECONDS: float = float(os.getenv("QUERY_CACHE_TTL_SECONDS", "60"))
+    REQUIREMENT_CACHE_SIZE: int = int(os.getenv("REQUIREMENT_CACHE_SIZE", "1024"))
+
+    # Local cache settings
+    CACHE_DIR: str = os.getenv("CACHE_DIR", ".cache")
+    EMBEDDING_CACHE_SIZE: int = int(os.getenv("EMBEDDING_CACHE_SIZE", "10000"))
+    EMBEDDING_CACHE_PATH: str = os.getenv("EMBEDDING_CACHE_PATH", os.path.join(CACHE_DIR, "embeddings.sqlite3"))
+    SEARCH_CACHE_SIZE: int = int(os.getenv("SEARCH_CACHE_SIZE", "512"))
+    CONTENT_INDEX_SIZE: int = int(os.getenv("CONTENT_INDEX_SIZE", "256"))
+    CONTENT_INDEX_PATH: str = os.getenv("CONTENT_INDEX_PATH", os.path.join(CACHE_DIR, "contents.sqlite3"))
+    JOB_STORE_PATH: str = os.getenv("JOB_STORE_PATH", os.path.join(CACHE_DIR, "jobs.sqlite3"))
+
+    # LLM response cache; entries expire after the TTL and the oldest are evicted past max entries
+    LLM_CACHE_ENABLED: bool = os.getenv("LLM_CACHE_ENABLED", "true").lower() == "true"
+    LLM_CACHE_SIZE: int = int(os.getenv("LLM_CACHE_SIZE", "512"))
+    LLM_CACHE_PATH: str = os.getenv("LLM_CACHE_PATH", os.path.join(CACHE_DIR, "llm.sqlite3"))
+    LLM_CACHE_TTL_SECONDS: float = float(os.getenv("LLM_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+    LLM_CACHE_MAX_ENTRIES: int = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "20000"))
+    
     class Config:
         case_sensitive = True
         env_file = ".env"
@@ -5,8 +5,14 @@ import os
 from google.cloud import bigquery
 from app.core.config import settings
 
-# Global BigQuery client
+try:
+    from google.cloud import bigquery_storage
+except ImportError:  # Storage Read API is optional; reads fall back to REST pages
+    bigquery_storage = None
+
+# Global BigQuery clients
 bq_client: bigquery.Client = None
+bq_storage_client = None
 
 
 def init_bigquery_client():
@@ -31,3 +37,14 @@ def get_bigquery_client() -> bigquery.Client:
     if bq_client is None:
         bq_client = init_bigquery_client()
     return bq_client
+
+
+def get_bigquery_storage_client():
+    """Get a BigQuery Storage Read API client, or None when it is unavailable"""
+    global bq_storage_client
+    if bq_storage_client is None and bigquery_storage is not None:
+        try:
+            bq_storage_client = bigquery_storage.BigQueryReadClient()
+        except Exception as e:
+            print(f"BigQuery Storage Read API unavailable, using REST reads: {e}")
+    return bq_storage_client
@@ -26,3 +26,9 @@ class JiraIntegrationError(HTTPException):
     """Exception raised when JIRA integration fails"""
     def __init__(self, detail: str):
         super().__init__(status_code=500, detail=f"JIRA integration error: {detail}")
+
+
+class QueueFullError(HTTPException):
+    """Exception raised when the background job queue is at capacity"""
+    def __init__(self, detail: str):
+        super().__init__(status_code=429, detail=f"Job queue is full: {detail}", headers={"Retry-After": "30"})
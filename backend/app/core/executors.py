@@ -0,0 +1,39 @@
+"""
+Dedicated thread pools for blocking service calls made from async endpoints
+"""
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict
+from app.core.config import settings
+
+# Separate pools keep slow BigQuery/Postgres calls from starving other work
+# and keep every blocking call off the event loop. Parsing and embedding for
+# uploads run on the background job pool; fan-out of Gemini calls shares the
+# "ai" pool, whose concurrency against the API is capped by the AI scheduler.
+# The scheduler only orders calls that reached it; fan-out on behalf of a
+# waiting request uses "ai_interactive" so it is not queued in the FIFO "ai"
+# pool behind bulk generation.
+_executors: Dict[str, ThreadPoolExecutor] = {
+    "db": ThreadPoolExecutor(max_workers=settings.DB_EXECUTOR_WORKERS, thread_name_prefix="db"),
+    "ai": ThreadPoolExecutor(max_workers=settings.AI_EXECUTOR_WORKERS, thread_name_prefix="ai"),
+    "ai_interactive": ThreadPoolExecutor(
+        max_workers=settings.AI_INTERACTIVE_EXECUTOR_WORKERS, thread_name_prefix="ai-interactive"
+    ),
+}
+
+
+def get_executor(name: str) -> ThreadPoolExecutor:
+    """Get a dedicated executor by name"""
+    return _executors[name]
+
+
+async def run_blocking(name: str, fn: Callable[..., Any], *args, **kwargs) -> Any:
+    """Run a blocking callable on the named executor and await its result"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executors[name], functools.partial(fn, *args, **kwargs))
+
+
+def shutdown_executors():
+    for executor in _executors.values():
+        executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,265 @@
+"""
+BigQuery table definitions and migration to partitioned/clustered tables
+
+Usage:
+    python -m app.core.schema            # create missing tables, columns and views; supersede duplicate test cases
+    python -m app.core.schema --migrate  # copy legacy tables into partitioned ones
+    python -m app.core.schema --migrate --swap
+"""
+import argparse
+from typing import Dict, List, Optional
+from google.api_core.exceptions import NotFound
+from google.cloud import bigquery
+from app.core.config import settings
+from app.core.database import get_bigquery_client
+
+SchemaField = bigquery.SchemaField
+
+TABLE_SCHEMAS: Dict[str, List[bigquery.SchemaField]] = {
+    "files": [
+        SchemaField("id", "STRING", mode="REQUIRED"),
+        SchemaField("filename", "STRING"),
+        SchemaField("extracted_data", "STRING"),
+        SchemaField("input_data", "STRING"),
+        SchemaField("status", "STRING"),
+        SchemaField("created_at", "TIMESTAMP"),
+    ],
+    "requirements": [
+        SchemaField("file_id", "STRING", mode="REQUIRED"),
+        SchemaField("requirement_id", "STRING", mode="REQUIRED"),
+        SchemaField("req_title_id", "STRING"),
+        SchemaField("title", "STRING"),
+        SchemaField("description", "STRING"),
+        SchemaField("type", "STRING"),
+        SchemaField("source", "STRING"),
+        SchemaField("category", "STRING"),
+        SchemaField("priority", "STRING"),
+        SchemaField("created_at", "TIMESTAMP"),
+    ],
+    "test_cases": [
+        SchemaField("file_id", "STRING"),
+        SchemaField("req_id", "STRING", mode="REQUIRED"),
+        SchemaField("req_title_id", "STRING"),
+        SchemaField("req_title", "STRING"),
+        SchemaField("req_description", "STRING"),
+        SchemaField("tc_id", "STRING", mode="REQUIRED"),
+        SchemaField("tc_title", "STRING"),
+        SchemaField("tc_description", "STRING"),
+        SchemaField("expected_result", "STRING"),
+        SchemaField("input_data", "STRING"),
+        SchemaField("compliance_tags", "STRING"),
+        SchemaField("risk", "STRING"),
+        SchemaField("created_at", "TIMESTAMP"),
+        # Regenerating a (req_id, tc_id) supersedes its current row and inserts the next version
+        SchemaField("version", "INT64"),
+        SchemaField("superseded_at", "TIMESTAMP"),
+    ],
+    # Append-only; the latest row per (file_id, req_id) is the requirement's generation state
+    "generation_checkpoints": [
+        SchemaField("file_id", "STRING", mode="REQUIRED"),
+        SchemaField("req_id", "STRING", mode="REQUIRED"),
+        SchemaField("run_id", "STRING"),
+        SchemaField("status", "STRING"),
+        SchemaField("generated", "INT64"),
+        SchemaField("error", "STRING"),
+        SchemaField("created_at", "TIMESTAMP"),
+    ],
+}
+
+# Clustering puts one file's rows together, so file-scoped reads scan only that file
+TABLE_CLUSTERING: Dict[str, List[str]] = {
+    "files": ["id"],
+    "requirements": ["file_id", "requirement_id"],
+    "test_cases": ["file_id", "req_id", "tc_id"],
+    "generation_checkpoints": ["file_id", "req_id"],
+}
+
+PARTITION_FIELD = "created_at"
+
+# Readers query the current rows only; superseded versions stay until compaction
+VIEWS: Dict[str, str] = {
+    "test_cases_current": "SELECT * FROM `{test_cases}` WHERE superseded_at IS NULL",
+}
+
+
+def _table_id(name: str) -> str:
+    return f"{settings.GCP_PROJECT_ID}.{settings.BIGQUERY_DATASET}.{name}"
+
+
+def _table_definition(name: str, table_id: Optional[str] = None) -> bigquery.Table:
+    table = bigquery.Table(table_id or _table_id(name), schema=TABLE_SCHEMAS[name])
+    table.time_partitioning = bigquery.TimePartitioning(
+        type_=bigquery.TimePartitioningType.DAY, field=PARTITION_FIELD
+    )
+    table.clustering_fields = TABLE_CLUSTERING[name]
+    return table
+
+
+def is_partitioned(client: bigquery.Client, name: str) -> bool:
+    table = client.get_table(_table_id(name))
+    return bool(table.time_partitioning and table.clustering_fields)
+
+
+def ensure_table(name: str, client: Optional[bigquery.Client] = None) -> str:
+    """
+    Create a table as partitioned by created_at and clustered by file if it
+    is missing, or add columns that were introduced after it was created
+    """
+    client = client or get_bigquery_client()
+    try:
+        table = client.get_table(_table_id(name))
+    except NotFound:
+        client.create_table(_table_definition(name))
+        return "created"
+
+    existing = {f.name for f in table.schema}
+    missing = [f for f in TABLE_SCHEMAS[name] if f.name not in existing]
+    if not missing:
+        return "exists"
+    # New columns are nullable, so existing rows read them as NULL
+    table.schema = list(table.schema) + [
+        SchemaField(f.name, f.field_type, mode="NULLABLE") for f in missing
+    ]
+    client.update_table(table, ["schema"])
+    return f"added columns {', '.join(f.name for f in missing)}"
+
+
+def ensure_view(name: str, client: Optional[bigquery.Client] = None) -> str:
+    """Create a view from VIEWS if it is missing"""
+    client = client or get_bigquery_client()
+    try:
+        client.get_table(_table_id(name))
+        return "exists"
+    except NotFound:
+        view = bigquery.Table(_table_id(name))
+        view.view_query = VIEWS[name].format(**{t: _table_id(t) for t in TABLE_SCHEMAS})
+        client.create_table(view)
+        return "created"
+
+
+def ensure_tables(client: Optional[bigquery.Client] = None) -> Dict[str, str]:
+    """Create or extend tables as partitioned by created_at and clustered by file, then create views"""
+    client = client or get_bigquery_client()
+    result = {name: ensure_table(name, client) for name in TABLE_SCHEMAS}
+    result.update({name: ensure_view(name, client) for name in VIEWS})
+    return result
+
+
+def check_schema(client: Optional[bigquery.Client] = None) -> List[str]:
+    """List missing tables, columns and views without changing anything"""
+    client = client or get_bigquery_client()
+    problems = []
+    for name, fields in TABLE_SCHEMAS.items():
+        try:
+            table = client.get_table(_table_id(name))
+        except NotFound:
+            problems.append(f"table {name} is missing")
+            continue
+        existing = {f.name for f in table.schema}
+        missing = [f.name for f in fields if f.name not in existing]
+        if missing:
+            problems.append(f"{name} is missing columns {', '.join(missing)}")
+    for name in VIEWS:
+        try:
+            client.get_table(_table_id(name))
+        except NotFound:
+            problems.append(f"view {name} is missing")
+    return problems
+
+
+def supersede_duplicate_test_cases(client: Optional[bigquery.Client] = None, table: str = "test_cases") -> str:
+    """
+    One-time cleanup for rows written before versioning: where a (req_id,
+    tc_id) has several current rows, keep the latest by created_at and mark
+    the others superseded so compaction removes them. The rows have no
+    unique id, so the duplicated keys are rewritten in one transaction.
+    """
+    client = client or get_bigquery_client()
+    table_id = _table_id(table)
+    columns = [f.name for f in client.get_table(table_id).schema]
+    # Legacy rows store created_at as an ISO string
+    created = "SAFE_CAST(CAST(created_at AS STRING) AS TIMESTAMP)"
+    select = [
+        "IF(_rank = 1, NULL, CURRENT_TIMESTAMP()) AS superseded_at" if c == "superseded_at" else c
+        for c in columns
+    ]
+    client.query(f"""
+        BEGIN TRANSACTION;
+        CREATE TEMP TABLE deduped AS
+        SELECT {", ".join(select)}
+        FROM (
+            SELECT *, ROW_NUMBER() OVER (
+                PARTITION BY req_id, tc_id ORDER BY {created} DESC, IFNULL(version, 1) DESC
+            ) AS _rank
+            FROM `{table_id}`
+            WHERE superseded_at IS NULL
+            QUALIFY COUNT(*) OVER (PARTITION BY req_id, tc_id) > 1
+        );
+        DELETE FROM `{table_id}` T
+        WHERE T.superseded_at IS NULL
+          AND EXISTS (SELECT 1 FROM deduped D WHERE D.req_id = T.req_id AND D.tc_id = T.tc_id);
+        INSERT INTO `{table_id}` ({", ".join(columns)})
+        SELECT {", ".join(columns)} FROM deduped;
+        COMMIT TRANSACTION;
+    """).result()
+    return "superseded duplicate current rows"
+
+
+def migrate_table(name: str, client: Optional[bigquery.Client] = None, swap: bool = False) -> str:
+    """
+    Copy a legacy, unpartitioned table into a partitioned/clustered one.
+    The copy is written to `<name>__partitioned`; with swap=True the legacy
+    table is renamed to `<name>__legacy` and the copy takes its name.
+    """
+    client = client or get_bigquery_client()
+    if is_partitioned(client, name):
+        return "already partitioned"
+
+    target = f"{name}__partitioned"
+    client.delete_table(_table_id(target), not_found_ok=True)
+    client.create_table(_table_definition(name, _table_id(target)))
+
+    columns = [f.name for f in TABLE_SCHEMAS[name]]
+    legacy_columns = {f.name for f in client.get_table(_table_id(name)).schema}
+    select = []
+    for column in columns:
+        if column not in legacy_columns:
+            select.append(f"NULL AS {column}")
+        elif column == PARTITION_FIELD:
+            # Legacy rows store created_at as an ISO string
+            select.append(f"SAFE_CAST(CAST({column} AS STRING) AS TIMESTAMP) AS {column}")
+        else:
+            select.append(column)
+
+    client.query(f"""
+        INSERT INTO `{_table_id(target)}` ({", ".join(columns)})
+        SELECT {", ".join(select)} FROM `{_table_id(name)}`
+    """).result()
+    if name == "test_cases":
+        supersede_duplicate_test_cases(client, target)
+
+    if not swap:
+        return f"copied to {target}"
+
+    client.query(f"ALTER TABLE `{_table_id(name)}` RENAME TO `{name}__legacy`").result()
+    client.query(f"ALTER TABLE `{_table_id(target)}` RENAME TO `{name}`").result()
+    return f"swapped; legacy data kept in {name}__legacy"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Create or migrate BigQuery tables")
+    parser.add_argument("--migrate", action="store_true", help="copy legacy tables into partitioned/clustered tables")
+    parser.add_argument("--swap", action="store_true", help="replace legacy tables with the migrated copies")
+    args = parser.parse_args()
+
+    for name, status in ensure_tables().items():
+        print(f"{name}: {status}")
+    if args.migrate:
+        for name in TABLE_SCHEMAS:
+            print(f"{name}: {migrate_table(name, swap=args.swap)}")
+    # Idempotent; only keys that still have several current rows are touched
+    print(f"test_cases: {supersede_duplicate_test_cases()}")
+
+
+if __name__ == "__main__":
+    main()
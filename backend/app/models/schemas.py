@@ -17,6 +17,7 @@ class MultiUploadResponse(BaseModel):
     file_ids: List[str]
     filenames: List[str]
     message: Optional[str] = None
+    job_id: Optional[str] = None
 
 
 # File management schemas
@@ -104,6 +105,22 @@ class ComplianceMetrics(BaseModel):
     last_updated: Optional[datetime] = None
 
 
+class ComplianceTestCase(BaseModel):
+    req_id: str
+    tc_id: str
+    tc_title: str = ""
+    compliance_tags: List[str] = []
+    risk: str = "Low"
+    created_at: Optional[datetime] = None
+
+
+class ComplianceTestCasePage(BaseModel):
+    items: List[ComplianceTestCase]
+    limit: int
+    offset: int
+    next_offset: Optional[int] = None
+
+
 # AI generation schemas
 class RequirementExtractionResponse(BaseModel):
     message: str
@@ -116,3 +133,47 @@ class TestCaseGenerationResponse(BaseModel):
     total_testcases_generated: int
     elapsed_seconds: float
     per_requirement: Dict[str, Any]
+
+
+class RequirementGenerationStatus(BaseModel):
+    requirement_id: str
+    title: Optional[str] = None
+    status: str
+    saved_test_cases: int = 0
+    attempts: int = 0
+    error: Optional[str] = None
+    run_id: Optional[str] = None
+    updated_at: Optional[datetime] = None
+
+
+class GenerationStatus(BaseModel):
+    file_id: str
+    total: int
+    done: int
+    failed: int
+    pending: int
+    requirements: List[RequirementGenerationStatus]
+
+
+# Background job schemas
+class JobStage(BaseModel):
+    name: str
+    status: str
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    elapsed_seconds: Optional[float] = None
+    done: int = 0
+    total: Optional[int] = None
+
+
+class JobStatus(BaseModel):
+    job_id: str
+    kind: str
+    status: str
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    elapsed_seconds: Optional[float] = None
+    stages: List[JobStage] = []
+    result: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
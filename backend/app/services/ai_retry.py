@@ -0,0 +1,200 @@
+"""
+Deadlines, retries with jittered backoff and hedged requests for model calls
+"""
+import time
+import random
+import threading
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, Optional
+from google.api_core import exceptions as google_exceptions
+from app.services.ai_scheduler import AIScheduler
+
+# Throttling, transient server errors and timeouts; anything else (bad
+# request, auth, safety blocks) fails the same way when retried
+_RETRYABLE = (
+    google_exceptions.TooManyRequests,
+    google_exceptions.ResourceExhausted,
+    google_exceptions.InternalServerError,
+    google_exceptions.BadGateway,
+    google_exceptions.ServiceUnavailable,
+    google_exceptions.GatewayTimeout,
+    google_exceptions.DeadlineExceeded,
+    google_exceptions.Aborted,
+    TimeoutError,
+    ConnectionError,
+)
+
+
+def is_retryable(error: Exception) -> bool:
+    return isinstance(error, _RETRYABLE)
+
+
+def backoff_delay(attempt: int, base: float, cap: float) -> float:
+    """Full-jitter exponential backoff before retry number attempt (1-based)"""
+    return random.uniform(0, min(cap, base * 2 ** (attempt - 1)))
+
+
+class LatencyTracker:
+    """Sliding window of recent call latencies"""
+
+    def __init__(self, window: int, min_samples: int = 20):
+        self._samples = deque(maxlen=max(1, window))
+        self.min_samples = min_samples
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, p: float) -> Optional[float]:
+        """The p-th percentile, or None until enough samples are collected"""
+        with self._lock:
+            if len(self._samples) < self.min_samples:
+                return None
+            ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * p / 100))]
+
+
+class ResilientCaller:
+    """
+    Runs model calls through the scheduler with a timeout per attempt and an
+    overall deadline, retrying retryable errors with jittered backoff. When
+    hedging is enabled and an attempt runs past the hedge percentile of
+    recent latencies, a duplicate request is sent and the first answer wins.
+    """
+
+    def __init__(
+        self,
+        scheduler: AIScheduler,
+        attempt_timeout: float,
+        deadline: float,
+        max_attempts: int,
+        backoff_base: float,
+        backoff_max: float,
+        hedge_percentile: float,
+        hedge_max_fraction: float,
+        latency_window: int,
+        hedge_workers: int,
+    ):
+        self.scheduler = scheduler
+        self.attempt_timeout = attempt_timeout
+        self.deadline = deadline
+        self.max_attempts = max(1, max_attempts)
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.hedge_percentile = hedge_percentile
+        self.hedge_max_fraction = hedge_max_fraction
+        self.latency = LatencyTracker(latency_window)
+        self._executor = (
+            ThreadPoolExecutor(max_workers=hedge_workers, thread_name_prefix="ai-hedge")
+            if hedge_percentile > 0 else None
+        )
+        self._lock = threading.Lock()
+        self._counters = {
+            "calls": 0, "attempts": 0, "retries": 0, "timeouts": 0,
+            "fatal_errors": 0, "exhausted": 0, "hedged": 0, "hedge_wins": 0,
+        }
+
+    def call(self, fn: Callable[[float], Any], priority: str, hedge: bool = True) -> Any:
+        """
+        Call fn(timeout_seconds) until it succeeds, fails fatally or runs out
+        of attempts/time. hedge=False for calls with side effects per attempt,
+        such as streamed responses.
+        """
+        self._count("calls")
+        deadline = time.monotonic() + self.deadline
+        attempt = 0
+        while True:
+            attempt += 1
+            timeout = min(self.attempt_timeout, deadline - time.monotonic())
+            try:
+                if timeout <= 0:
+                    raise TimeoutError("Model call deadline exceeded")
+                return self._attempt(fn, timeout, deadline, priority, hedge)
+            except Exception as e:
+                if isinstance(e, (TimeoutError, google_exceptions.DeadlineExceeded)):
+                    self._count("timeouts")
+                if not is_retryable(e):
+                    self._count("fatal_errors")
+                    raise
+                delay = backoff_delay(attempt, self.backoff_base, self.backoff_max)
+                if attempt >= self.max_attempts or time.monotonic() + delay >= deadline:
+                    self._count("exhausted")
+                    raise
+                self._count("retries")
+                print(f"Model call failed with {type(e).__name__}: {e}; retry {attempt} in {delay:.1f}s")
+                time.sleep(delay)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._counters)
+        p50 = self.latency.percentile(50)
+        hedge_after = self.latency.percentile(self.hedge_percentile) if self._executor else None
+        stats["latency_p50_seconds"] = round(p50, 3) if p50 is not None else None
+        stats["hedge_after_seconds"] = round(hedge_after, 3) if hedge_after is not None else None
+        return stats
+
+    def _attempt(
+        self, fn: Callable[[float], Any], timeout: float, deadline: float, priority: str, hedge: bool
+    ) -> Any:
+        self._count("attempts")
+        hedge_after = self._hedge_threshold(timeout, priority) if hedge else None
+        if hedge_after is None:
+            return self._scheduled(fn, timeout, deadline, priority)
+
+        started = time.monotonic()
+        primary = self._executor.submit(self._scheduled, fn, timeout, deadline, priority)
+        done, _ = wait([primary], timeout=hedge_after)
+        if done:
+            return primary.result()
+
+        self._count("hedged")
+        hedge = self._executor.submit(self._scheduled, fn, timeout - hedge_after, deadline, priority)
+        pending = {primary, hedge}
+        error = None
+        while pending:
+            remaining = timeout - (time.monotonic() - started)
+            done, pending = wait(pending, timeout=max(0.0, remaining), return_when=FIRST_COMPLETED)
+            if not done:
+                raise TimeoutError(f"Model call exceeded {timeout:.1f}s")
+            for future in done:
+                if future.exception() is None:
+                    if future is hedge:
+                        self._count("hedge_wins")
+                    return future.result()
+                error = future.exception()
+        raise error
+
+    def _hedge_threshold(self, timeout: float, priority: str) -> Optional[float]:
+        """Seconds to wait before hedging this attempt, or None to not hedge it"""
+        if not self._executor:
+            return None
+        # A hedge queued behind other calls would only add load
+        if self.scheduler.queue_depth(priority):
+            return None
+        with self._lock:
+            if self._counters["hedged"] >= self.hedge_max_fraction * self._counters["attempts"]:
+                return None
+        threshold = self.latency.percentile(self.hedge_percentile)
+        if threshold is None or threshold >= timeout:
+            return None
+        return threshold
+
+    def _scheduled(self, fn: Callable[[float], Any], timeout: float, deadline: float, priority: str) -> Any:
+        return self.scheduler.run(self._timed, fn, timeout, deadline, priority=priority)
+
+    def _timed(self, fn: Callable[[float], Any], timeout: float, deadline: float) -> Any:
+        # Measured after admission, so queueing in the scheduler doesn't trigger hedges
+        start = time.monotonic()
+        # but the time spent queued still counts against the overall deadline
+        timeout = min(timeout, deadline - start)
+        if timeout <= 0:
+            raise TimeoutError("Model call deadline exceeded while queued")
+        result = fn(timeout)
+        self.latency.record(time.monotonic() - start)
+        return result
+
+    def _count(self, name: str):
+        with self._lock:
+            self._counters[name] += 1
@@ -0,0 +1,143 @@
+"""
+Process-wide scheduler for model calls: global in-flight cap, token-bucket
+rate limit and priority lanes
+"""
+import time
+import heapq
+import itertools
+import threading
+from typing import Any, Callable, Dict, List, Tuple
+from app.core.config import settings
+
+INTERACTIVE = "interactive"
+BULK = "bulk"
+
+# Lower value is served first
+_PRIORITIES = {INTERACTIVE: 0, BULK: 1}
+
+
+class TokenBucket:
+    """Refills rate_per_minute tokens per minute, holding at most capacity"""
+
+    def __init__(self, rate_per_minute: float, capacity: int):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = max(1, capacity)
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+
+    def take(self) -> float:
+        """Take a token if one is available and return 0, else return seconds until one is"""
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+
+class LaneStats:
+    def __init__(self):
+        self.waiting = 0
+        self.completed = 0
+        self.failed = 0
+        self.wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+
+    def as_dict(self) -> Dict[str, Any]:
+        started = self.completed + self.failed
+        return {
+            "queue_depth": self.waiting,
+            "completed": self.completed,
+            "failed": self.failed,
+            "avg_wait_ms": round(self.wait_seconds / started * 1000, 1) if started else 0.0,
+            "max_wait_ms": round(self.max_wait_seconds * 1000, 1),
+        }
+
+
+class AIScheduler:
+    """
+    Admits model calls one at a time in priority order: interactive calls
+    before bulk ones, FIFO within a lane. A call starts once fewer than
+    max_in_flight calls are running and the token bucket has a token, so
+    all callers in the process share one concurrency cap and quota.
+    """
+
+    def __init__(self, max_in_flight: int, rate_per_minute: float, burst: int):
+        self.max_in_flight = max(1, max_in_flight)
+        self.bucket = TokenBucket(rate_per_minute, burst) if rate_per_minute > 0 else None
+        self._cond = threading.Condition()
+        self._waiters: List[Tuple[int, int]] = []
+        self._seq = itertools.count()
+        self._in_flight = 0
+        self._rate_limited = 0
+        self._lanes = {lane: LaneStats() for lane in _PRIORITIES}
+
+    def run(self, fn: Callable[..., Any], *args, priority: str = BULK, **kwargs) -> Any:
+        """Wait for a slot in the given lane, then call fn"""
+        lane = self._lanes[priority]
+        waited = self._acquire(priority)
+        try:
+            result = fn(*args, **kwargs)
+        except Exception:
+            self._release(lane, waited, failed=True)
+            raise
+        self._release(lane, waited, failed=False)
+        return result
+
+    def queue_depth(self, priority: str) -> int:
+        """Number of calls waiting in a lane"""
+        with self._cond:
+            return self._lanes[priority].waiting
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            return {
+                "in_flight": self._in_flight,
+                "max_in_flight": self.max_in_flight,
+                "rate_per_minute": round(self.bucket.rate * 60, 1) if self.bucket else None,
+                "rate_limited_waits": self._rate_limited,
+                "lanes": {name: lane.as_dict() for name, lane in self._lanes.items()},
+            }
+
+    def _acquire(self, priority: str) -> float:
+        start = time.monotonic()
+        ticket = (_PRIORITIES[priority], next(self._seq))
+        with self._cond:
+            heapq.heappush(self._waiters, ticket)
+            self._lanes[priority].waiting += 1
+            while True:
+                if self._waiters[0] == ticket and self._in_flight < self.max_in_flight:
+                    delay = self.bucket.take() if self.bucket else 0.0
+                    if not delay:
+                        break
+                    # Head of the queue waits for the next token; everyone else stays behind it
+                    self._rate_limited += 1
+                    self._cond.wait(delay)
+                else:
+                    self._cond.wait()
+            heapq.heappop(self._waiters)
+            self._lanes[priority].waiting -= 1
+            self._in_flight += 1
+            # The next waiter may be able to start too
+            self._cond.notify_all()
+        return time.monotonic() - start
+
+    def _release(self, lane: LaneStats, waited: float, failed: bool):
+        with self._cond:
+            self._in_flight -= 1
+            if failed:
+                lane.failed += 1
+            else:
+                lane.completed += 1
+            lane.wait_seconds += waited
+            lane.max_wait_seconds = max(lane.max_wait_seconds, waited)
+            self._cond.notify_all()
+
+
+# Global scheduler shared by every AIService call
+ai_scheduler = AIScheduler(
+    settings.AI_MAX_IN_FLIGHT,
+    settings.AI_RATE_LIMIT_PER_MINUTE,
+    settings.AI_RATE_LIMIT_BURST,
+)
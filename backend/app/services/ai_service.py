@@ -2,11 +2,18 @@
 AI service for requirements extraction and test case generation
 """
 import os
+import re
 import json
-from typing import List, Dict, Optional
+from concurrent.futures import FIRST_COMPLETED, wait
+from typing import Any, Callable, List, Dict, Optional
 import google.generativeai as genai
 from app.core.config import settings
 from app.core.exceptions import AIServiceError
+from app.core.executors import get_executor
+from app.services.llm_cache import LLMResponseCache
+from app.services.json_stream import JSONArrayStream
+from app.services.ai_scheduler import ai_scheduler, BULK, INTERACTIVE
+from app.services.ai_retry import ResilientCaller
 
 # Initialize Gemini
 if settings.GOOGLE_API_KEY:
@@ -17,19 +24,107 @@ class AIService:
     """AI service for healthcare document processing"""
     
     def __init__(self):
+        self.model_name = "gemini-2.0-flash"
         self.model = self._get_model()
+        self.cache = LLMResponseCache(
+            settings.LLM_CACHE_SIZE,
+            settings.LLM_CACHE_PATH,
+            ttl_seconds=settings.LLM_CACHE_TTL_SECONDS,
+            max_entries=settings.LLM_CACHE_MAX_ENTRIES,
+        ) if settings.LLM_CACHE_ENABLED else None
+        self.caller = ResilientCaller(
+            ai_scheduler,
+            attempt_timeout=settings.AI_CALL_TIMEOUT_SECONDS,
+            deadline=settings.AI_CALL_DEADLINE_SECONDS,
+            max_attempts=settings.AI_MAX_ATTEMPTS,
+            backoff_base=settings.AI_BACKOFF_BASE_SECONDS,
+            backoff_max=settings.AI_BACKOFF_MAX_SECONDS,
+            hedge_percentile=settings.AI_HEDGE_PERCENTILE,
+            hedge_max_fraction=settings.AI_HEDGE_MAX_FRACTION,
+            latency_window=settings.AI_LATENCY_WINDOW,
+            hedge_workers=settings.AI_EXECUTOR_WORKERS,
+        )
     
     def _get_model(self):
         """Get Gemini model instance"""
         if not settings.GOOGLE_API_KEY:
             return None
         try:
-            return genai.GenerativeModel("gemini-2.0-flash")
+            return genai.GenerativeModel(self.model_name)
         except Exception as e:
             print(f"Error creating AI model: {e}")
             return None
     
-    def extract_requirements_from_text(self, text_data: str) -> List[Dict]:
+    def _generate(
+        self,
+        prompt: Any,
+        generation_config: Dict,
+        parse: Callable[[str], Any],
+        use_cache: bool = True,
+        priority: str = BULK,
+        on_text: Optional[Callable[[str], None]] = None,
+    ) -> Any:
+        """
+        Call the model and return parse(response text). Responses are cached
+        by model, prompt and config, and only once parse accepts them, so a
+        malformed answer is retried rather than replayed. Calls that miss the
+        cache wait for the shared scheduler in the given priority lane and
+        are retried/hedged by self.caller.
+        
+        With on_text the response is streamed and on_text receives the text
+        received so far after every chunk, starting over if the call is
+        retried; a cache hit calls it once with the whole text.
+        """
+        key = None
+        if self.cache and use_cache:
+            key = self.cache.key(self.model_name, prompt, generation_config)
+            cached = self.cache.get(key)
+            if cached is not None:
+                if on_text:
+                    on_text(cached)
+                return parse(cached)
+        
+        if on_text:
+            text = self.caller.call(
+                lambda timeout: self._stream_text(prompt, generation_config, timeout, on_text),
+                priority,
+                hedge=False
+            )
+        else:
+            response = self.caller.call(
+                lambda timeout: self.model.generate_content(
+                    prompt, generation_config=generation_config, request_options={"timeout": timeout}
+                ),
+                priority
+            )
+            text = response.text or ""
+        result = parse(text)
+        if key:
+            self.cache.set(key, text)
+        return result
+    
+    def _stream_text(
+        self, prompt: Any, generation_config: Dict, timeout: float, on_text: Callable[[str], None]
+    ) -> str:
+        text = ""
+        for chunk in self.model.generate_content(
+            prompt, generation_config=generation_config, stream=True, request_options={"timeout": timeout}
+        ):
+            text += chunk.text or ""
+            on_text(text)
+        return text
+    
+    def cache_stats(self) -> Optional[Dict]:
+        """Hit/miss counters of the response cache"""
+        return self.cache.stats() if self.cache else None
+    
+    def call_stats(self) -> Dict:
+        """Retry, timeout and hedging counters of model calls"""
+        return self.caller.stats()
+    
+    def extract_requirements_from_text(
+        self, text_data: str, use_cache: bool = True, priority: str = BULK
+    ) -> List[Dict]:
         """
         Extract requirements from text data using AI
         """
@@ -38,12 +133,14 @@ class AIService:
         
         try:
             prompt = self._build_requirements_prompt(text_data)
-            response = self.model.generate_content(
+            data = self._generate(
                 prompt, 
-                generation_config={"response_mime_type": "application/json"}
+                {"response_mime_type": "application/json"},
+                lambda text: json.loads(text or "{}"),
+                use_cache=use_cache,
+                priority=priority
             )
             
-            data = json.loads(response.text or "{}")
             requirements = data.get("requirements", [])
             
             return requirements if requirements else self._fallback_requirements()
@@ -52,48 +149,162 @@ class AIService:
             print(f"AI requirements extraction failed: {e}")
             return self._fallback_requirements()
             
-    def extract_single_requirement_with_context(self, requirement: str, similar_contexts: List[Dict]) -> Dict:
+    def extract_requirements_chunked(
+        self, chunks: List[Dict], use_cache: bool = True, priority: str = BULK
+    ) -> List[Dict]:
+        """
+        Map-reduce extraction for documents too large for one prompt. Each
+        page chunk (see DocumentService.chunk_pages) is extracted on the AI
+        pool with up to REQUIREMENT_EXTRACTION_PARALLELISM calls in flight,
+        then requirements found in several chunks are merged. INTERACTIVE
+        extraction uses its own pool so it never waits behind bulk work.
+        """
+        if not self.model or not settings.GOOGLE_API_KEY:
+            return self._fallback_requirements()
+        
+        executor = get_executor("ai_interactive" if priority == INTERACTIVE else "ai")
+        results: List[Optional[List[Dict]]] = [None] * len(chunks)
+        queued = list(enumerate(chunks))[::-1]
+        pending = {}
+        while queued or pending:
+            while queued and len(pending) < max(1, settings.REQUIREMENT_EXTRACTION_PARALLELISM):
+                index, chunk = queued.pop()
+                future = executor.submit(
+                    self._extract_chunk_requirements, chunk, index + 1, len(chunks), use_cache, priority
+                )
+                pending[future] = index
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                index = pending.pop(future)
+                try:
+                    results[index] = future.result()
+                except Exception as e:
+                    print(f"AI requirements extraction failed for chunk {index + 1}/{len(chunks)}: {e}")
+        
+        extracted = [reqs for reqs in results if reqs is not None]
+        if not extracted:
+            return self._fallback_requirements()
+        requirements = self._merge_requirements(extracted)
+        return requirements if requirements else self._fallback_requirements()
+    
+    def _extract_chunk_requirements(
+        self, chunk: Dict, part: int, parts: int, use_cache: bool, priority: str
+    ) -> List[Dict]:
+        pages = _page_label(chunk)
+        prompt = self._build_requirements_prompt(chunk["text"], part=(part, parts, pages))
+        data = self._generate(
+            prompt,
+            {"response_mime_type": "application/json"},
+            lambda text: json.loads(text or "{}"),
+            use_cache=use_cache,
+            priority=priority
+        )
+        
+        requirements = [req for req in data.get("requirements", []) if isinstance(req, dict)]
+        for req in requirements:
+            # Keep a page reference even when the model leaves the source vague
+            if pages and not re.search(r"\d", str(req.get("source") or "")):
+                req["source"] = pages
+        return requirements
+    
+    def _merge_requirements(self, chunk_requirements: List[List[Dict]]) -> List[Dict]:
+        """
+        Reduce step of chunked extraction: requirements whose titles share at
+        least REQUIREMENT_DEDUP_SIMILARITY of their words are merged, keeping
+        the longest description, the highest priority and every source
+        """
+        merged: List[Dict] = []
+        title_words: List[set] = []
+        for requirements in chunk_requirements:
+            for req in requirements:
+                words = set(re.findall(r"[a-z0-9]+", str(req.get("title") or "").lower()))
+                match = next(
+                    (i for i, other in enumerate(title_words)
+                     if words and len(words & other) / len(words | other) >= settings.REQUIREMENT_DEDUP_SIMILARITY),
+                    None
+                )
+                if match is None:
+                    merged.append(dict(req))
+                    title_words.append(words)
+                    continue
+                
+                kept = merged[match]
+                if len(str(req.get("description") or "")) > len(str(kept.get("description") or "")):
+                    kept["description"] = req.get("description")
+                if _PRIORITY_RANK.get(req.get("priority"), 0) > _PRIORITY_RANK.get(kept.get("priority"), 0):
+                    kept["priority"] = req.get("priority")
+                sources = [s for s in str(kept.get("source") or "").split("; ") if s]
+                source = str(req.get("source") or "")
+                if source and source not in sources:
+                    kept["source"] = "; ".join(sources + [source])
+        return merged
+    
+    def extract_single_requirement_with_context(
+        self, requirement: str, similar_contexts: List[Dict], use_cache: bool = True, priority: str = BULK
+    ) -> Dict:
         """
-        Extract a single requirement using the input requirement and semantic search context
+        Extract a single requirement using the input requirement and semantic search context.
+        Raises AIServiceError on failure so callers can report the line instead
+        of saving a placeholder requirement.
         """
         if not self.model or not settings.GOOGLE_API_KEY:
-            return self._fallback_requirements()[0]  # Return single requirement
+            raise AIServiceError("AI model not available")
             
         try:
             prompt = self._build_contextual_requirements_prompt(requirement, similar_contexts)
-            response = self.model.generate_content(
+            return self._generate(
                 prompt,
-                generation_config={"response_mime_type": "application/json"}
+                {"response_mime_type": "application/json"},
+                self._parse_single_requirement,
+                use_cache=use_cache,
+                priority=priority
             )
-            #print(f"AI response for contextual requirement: {response.text}")
-            
-            data = json.loads(response.text or "{}")
-            # Since we're expecting a single requirement object, not an array
-            if isinstance(data, dict) and all(k in data for k in ["type", "title", "description"]):
-                return data
-            
-            print(f"Unexpected response format: {data}")
-            return self._fallback_requirements()[0]  # Return single requirement
             
         except Exception as e:
-            print(f"AI requirements extraction failed: {e}")
-            return self._fallback_requirements()[0]  # Return single requirement
+            raise AIServiceError(f"Requirement extraction failed: {e}")
     
-    def generate_test_cases(self, feature_title: str, feature_desc: str, input_data: str = "") -> List[Dict]:
+    def generate_test_cases(
+        self,
+        feature_title: str,
+        feature_desc: str,
+        input_data: str = "",
+        use_cache: bool = True,
+        priority: str = BULK,
+        on_test_case: Optional[Callable[[int, Dict], None]] = None,
+    ) -> List[Dict]:
         """
-        Generate test cases for a healthcare system feature/requirement
+        Generate test cases for a healthcare system feature/requirement.
+        With on_test_case the response is streamed and on_test_case(index,
+        test case) is called for each test case as soon as it has been
+        received; the returned list is still the complete, validated result.
         """
         if not self.model:
             raise AIServiceError("AI model not available")
         
+        on_text = None
+        if on_test_case:
+            stream = JSONArrayStream("test_cases")
+            sent = set()
+            
+            def on_text(text: str):
+                for index, item in stream.feed(text):
+                    cleaned = self._clean_test_cases([item]) if isinstance(item, dict) else []
+                    # A retried call reports earlier test cases again
+                    if cleaned and index not in sent:
+                        sent.add(index)
+                        on_test_case(index, cleaned[0])
+        
         try:
             prompt = self._build_test_cases_prompt(feature_title, feature_desc, input_data)
-            response = self.model.generate_content(
+            data = self._generate(
                 prompt,
-                generation_config={"response_mime_type": "application/json"}
+                {"response_mime_type": "application/json"},
+                lambda text: json.loads(text or "{}"),
+                use_cache=use_cache,
+                priority=priority,
+                on_text=on_text
             )
             
-            data = json.loads(response.text or "{}")
             test_cases = data.get("test_cases", [])
             
             return self._clean_test_cases(test_cases)
@@ -103,7 +314,97 @@ class AIService:
         except Exception as e:
             raise AIServiceError(f"Test case generation failed: {e}")
     
-    def improve_test_case(self, original_description: str, user_input: str) -> str:
+    def generate_test_cases_batch(
+        self,
+        requirements: List[Dict],
+        input_data: str = "",
+        use_cache: bool = True,
+        priority: str = BULK,
+    ) -> Dict[str, Any]:
+        """
+        Generate test cases for several requirements with one prompt.
+        Returns {requirement_id: test cases}. Requirements missing from a
+        malformed or partial batch answer fall back to single calls; if such
+        a call fails, its exception is returned in place of the test cases.
+        """
+        if not self.model:
+            raise AIServiceError("AI model not available")
+        
+        # Short positional keys are easier for the model to echo back than UUIDs
+        features = {f"R{i}": req for i, req in enumerate(requirements, start=1)}
+        results: Dict[str, Any] = {}
+        if len(features) > 1:
+            try:
+                prompt = self._build_batched_test_cases_prompt(features, input_data)
+                by_key = self._generate(
+                    prompt,
+                    {"response_mime_type": "application/json"},
+                    lambda text: self._parse_batched_test_cases(text, features),
+                    use_cache=use_cache,
+                    priority=priority
+                )
+                results = {features[key]["requirement_id"]: tests for key, tests in by_key.items()}
+            except Exception as e:
+                print(f"Batched test case generation for {len(features)} requirements failed, falling back: {e}")
+        
+        for req in requirements:
+            if req["requirement_id"] in results:
+                continue
+            try:
+                results[req["requirement_id"]] = self.generate_test_cases(
+                    req["title"], req["description"], input_data, use_cache=use_cache, priority=priority
+                )
+            except Exception as e:
+                results[req["requirement_id"]] = e
+        return results
+    
+    def plan_test_case_batches(self, requirements: List[Dict], input_data: str = "") -> List[List[Dict]]:
+        """
+        Group requirements into batches for generate_test_cases_batch, sized so
+        the prompt stays under AI_BATCH_INPUT_TOKENS and the expected output
+        under AI_BATCH_OUTPUT_TOKENS (both estimated at ~4 characters per token)
+        """
+        fixed = _estimate_tokens(self._test_case_system_prompt()) + _estimate_tokens(
+            self._test_case_guidelines(input_data)
+        )
+        batches, current, tokens = [], [], fixed
+        for req in requirements:
+            req_tokens = _estimate_tokens(req["title"]) + _estimate_tokens(req["description"])
+            full = (
+                len(current) >= settings.AI_BATCH_MAX_REQUIREMENTS
+                or tokens + req_tokens > settings.AI_BATCH_INPUT_TOKENS
+                or (len(current) + 1) * settings.AI_TEST_CASE_OUTPUT_TOKENS > settings.AI_BATCH_OUTPUT_TOKENS
+            )
+            if current and full:
+                batches.append(current)
+                current, tokens = [], fixed
+            current.append(req)
+            tokens += req_tokens
+        if current:
+            batches.append(current)
+        return batches
+    
+    def _parse_batched_test_cases(self, text: str, features: Dict[str, Dict]) -> Dict[str, List[Dict]]:
+        """Parse a batched answer into {feature key: cleaned test cases}; keys without test cases are left out"""
+        data = json.loads(text or "{}")
+        entries = data.get("features") if isinstance(data, dict) else None
+        if not isinstance(entries, list):
+            raise ValueError("Batched response has no features list")
+        
+        by_key = {}
+        for entry in entries:
+            if not isinstance(entry, dict) or entry.get("feature_key") not in features:
+                continue
+            tests = self._clean_test_cases([t for t in entry.get("test_cases") or [] if isinstance(t, dict)])
+            if tests:
+                by_key[entry["feature_key"]] = tests
+        if not by_key:
+            raise ValueError("Batched response has no usable test cases")
+        return by_key
+    
+    def improve_test_case(
+        self, original_description: str, user_input: str, use_cache: bool = True, priority: str = INTERACTIVE
+    ) -> str:
         """
         Improve test case description based on user feedback
         """
@@ -118,18 +419,39 @@ class AIService:
                 "Return only the improved test case description as a string."
             )
             
-            response = self.model.generate_content(
+            improved = self._generate(
                 [system, user_prompt],
-                generation_config={"response_mime_type": "text/plain"}
+                {"response_mime_type": "text/plain"},
+                str.strip,
+                use_cache=use_cache,
+                priority=priority
             )
             
-            return response.text.strip() if response.text else original_description
+            return improved or original_description
             
         except Exception as e:
             raise AIServiceError(f"Test case improvement failed: {e}")
     
-    def _build_requirements_prompt(self, text_data: str) -> str:
-        """Build prompt for requirements extraction"""
+    def _parse_single_requirement(self, text: str) -> Dict:
+        """Parse a single requirement object; anything else is rejected"""
+        data = json.loads(text or "{}")
+        # Since we're expecting a single requirement object, not an array
+        if isinstance(data, dict) and all(k in data for k in ["type", "title", "description"]):
+            return data
+        raise ValueError(f"Unexpected response format: {data}")
+    
+    def _build_requirements_prompt(self, text_data: str, part: Optional[tuple] = None) -> str:
+        """Build prompt for requirements extraction; part is (index, count, pages) for one chunk of a larger document"""
+        part_note = ""
+        if part:
+            index, count, pages = part
+            covering = f" ({pages})" if pages else ""
+            part_note = f"""##Document Part:
+
+This is part {index} of {count} of a larger document{covering}. Extract only the requirements stated in this part; the parts are merged afterwards.
+Each page starts with its page number followed by the word "text". Set "source" to the page number(s) the requirement was found on, e.g. "Page 12".
+
+"""
         return f"""
 You are an expert Business Analyst and Software Quality Assurance Engineer specializing in medical software (IEC 62304, FDA, HIPAA). Your task is to analyze the provided healthcare software document and extract a comprehensive, detailed list of functional and non-functional requirements.
 
@@ -162,7 +484,7 @@ Requirement Format (JSON):
     ]
 }}
 
-Document Text to Analyze:
+{part_note}Document Text to Analyze:
 {text_data}
 
 Output (JSON Array):
@@ -219,16 +541,6 @@ Output (Single JSON Object):
 """
     def _build_test_cases_prompt(self, feature_title: str, feature_desc: str, input_data: str) -> str:
         """Build prompt for test case generation"""
-        standards = ["FDA", "IEC 62304", "ISO 9001", "ISO 13485", "ISO 27001"]
-        
-        system = (
-            "You are a senior QA engineer specializing in healthcare system software. "
-            "Produce thorough, actionable test cases with good coverage across functional, negative, boundary, performance, security, and compliance dimensions. "
-            "Each test case should include step-by-step instructions and an explicit expected result. "
-            "All outputs and processing must be privacy-preserving by design, GDPR-ready, and suitable for safe pilots in healthcare environments. "
-            "Do not include or infer any real patient data or personally identifiable information (PII)."
-        )
-        
         user_prompt = (
             "Generate a comprehensive but non-duplicative set of test cases for the healthcare feature below.\n"
             "Return STRICT JSON with this exact schema:\n"
@@ -237,6 +549,45 @@ Output (Single JSON Object):
             ']}\n\n'
             f"Feature Title: {feature_title}\n"
             f"Feature Description: {feature_desc}\n\n"
+        ) + self._test_case_guidelines(input_data)
+        
+        return [self._test_case_system_prompt(), user_prompt]
+    
+    def _build_batched_test_cases_prompt(self, features: Dict[str, Dict], input_data: str) -> str:
+        """Build one prompt that asks for test cases of several features, keyed by feature key"""
+        feature_text = "".join(
+            f"Feature {key}\n"
+            f"Feature Title: {req['title']}\n"
+            f"Feature Description: {req['description']}\n\n"
+            for key, req in features.items()
+        )
+        user_prompt = (
+            "Generate a comprehensive but non-duplicative set of test cases for EACH healthcare feature below.\n"
+            "Return STRICT JSON with this exact schema, with one entry per feature using its feature key:\n"
+            '{ "features": [\n'
+            '  {"feature_key": "R1", "test_cases": [\n'
+            '    {"test_id": "TC-001", "title": "...", "description": "Step by step instructions...", "input_data": "...", "expected_result": "...", "compliance": ["FDA", "IEC 62304", ...], "risk": "..." }\n'
+            '  ]}\n'
+            ']}\n'
+            "Number test_id from TC-001 within each feature and never mix test cases between features.\n\n"
+            f"{feature_text}"
+        ) + self._test_case_guidelines(input_data)
+        
+        return [self._test_case_system_prompt(), user_prompt]
+    
+    def _test_case_system_prompt(self) -> str:
+        return (
+            "You are a senior QA engineer specializing in healthcare system software. "
+            "Produce thorough, actionable test cases with good coverage across functional, negative, boundary, performance, security, and compliance dimensions. "
+            "Each test case should include step-by-step instructions and an explicit expected result. "
+            "All outputs and processing must be privacy-preserving by design, GDPR-ready, and suitable for safe pilots in healthcare environments. "
+            "Do not include or infer any real patient data or personally identifiable information (PII)."
+        )
+    
+    def _test_case_guidelines(self, input_data: str) -> str:
+        """Instructions shared by the single and batched test case prompts"""
+        standards = ["FDA", "IEC 62304", "ISO 9001", "ISO 13485", "ISO 27001"]
+        return (
             f"Compliance options to choose from: {standards}.\n"
             "Risk levels to consider: Choose any one Low, Medium, High, Critical.\n"
             "Only include compliance items that are relevant to the test; omit others.\n"
@@ -247,8 +598,6 @@ Output (Single JSON Object):
             "- If input_data is provided, use it; otherwise, generate dummy input_data relevant to healthcare systems, ensuring no PII or sensitive data is present.\n"
             "All outputs must be suitable for GDPR-compliant, privacy-preserving healthcare pilots."
         )
-        
-        return [system, user_prompt]
     
     def _clean_test_cases(self, test_cases: List[Dict]) -> List[Dict]:
         """Clean and validate test cases"""
@@ -288,5 +637,19 @@ Output (Single JSON Object):
         }]
 
 
+_PRIORITY_RANK = {"Low": 1, "Medium": 2, "High": 3}
+
+
+def _page_label(chunk: Dict) -> str:
+    first, last = chunk.get("first_page"), chunk.get("last_page")
+    if first is None:
+        return ""
+    return f"Page {first}" if first == last else f"Pages {first}-{last}"
+
+
+def _estimate_tokens(text: str) -> int:
+    return len(text or "") // 4 + 1
+
+
 # Global AI service instance
 ai_service = AIService()
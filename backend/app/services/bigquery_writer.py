@@ -0,0 +1,221 @@
+"""
+Append transports for BigQuery: streaming inserts for small batches,
+load jobs for bulk writes
+"""
+import json
+import time
+import uuid
+import threading
+from io import BytesIO
+from typing import Any, Dict, Iterable, List
+from google.api_core import exceptions as google_exceptions
+from google.cloud import bigquery
+from app.core.config import settings
+from app.services.ai_retry import backoff_delay, is_retryable
+
+STREAM = "stream"
+LOAD = "load"
+
+
+class TransportStats:
+    """Row, byte and timing counters for one transport"""
+
+    def __init__(self):
+        self.rows = 0
+        self.bytes = 0
+        self.requests = 0
+        self.seconds = 0.0
+        self.retried_rows = 0
+        self.failed_rows = 0
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "rows": self.rows,
+            "bytes": self.bytes,
+            "requests": self.requests,
+            "seconds": round(self.seconds, 3),
+            "retried_rows": self.retried_rows,
+            "failed_rows": self.failed_rows,
+            "rows_per_second": round(self.rows / self.seconds, 1) if self.seconds else 0.0,
+            "bytes_per_second": round(self.bytes / self.seconds, 1) if self.seconds else 0.0,
+        }
+
+
+class BigQueryWriter:
+    """
+    Appends rows to BigQuery tables. Batches below the load-job thresholds
+    go through the streaming insert API in chunks that stay under its
+    request limits; larger batches use one NDJSON load job, which keeps
+    load jobs (slow to start, daily per-table quota) for bulk writes.
+
+    Rows still in the streaming buffer cannot be changed by UPDATE/MERGE
+    for a while, so tables updated right after insert are listed in
+    dml_tables (or writes pass allow_stream=False) and always use load jobs.
+    """
+
+    def __init__(self, client: bigquery.Client, dml_tables: Iterable[str] = ()):
+        self.client = client
+        self.dml_tables = set(dml_tables)
+        self.mode = settings.BIGQUERY_WRITE_TRANSPORT
+        self.load_min_rows = settings.BIGQUERY_LOAD_MIN_ROWS
+        self.load_min_bytes = settings.BIGQUERY_LOAD_MIN_BYTES
+        self.chunk_rows = settings.BIGQUERY_STREAM_CHUNK_ROWS
+        self.chunk_bytes = settings.BIGQUERY_STREAM_CHUNK_BYTES
+        self.max_attempts = max(1, settings.BIGQUERY_STREAM_MAX_ATTEMPTS)
+        self.load_max_attempts = max(1, settings.BIGQUERY_LOAD_MAX_ATTEMPTS)
+        self._stats = {STREAM: TransportStats(), LOAD: TransportStats()}
+        self._lock = threading.Lock()
+
+    def write(self, table_id: str, rows: List[Dict], allow_stream: bool = True) -> str:
+        """Append rows to table_id; returns the transport that was used"""
+        encoded = [json.dumps(row).encode("utf-8") for row in rows]
+        table_name = table_id.rsplit(".", 1)[-1]
+        transport = self._choose(encoded, allow_stream and table_name not in self.dml_tables)
+        if not rows:
+            return transport
+        if transport == STREAM:
+            self._stream(table_id, rows, encoded)
+        else:
+            self._load(table_id, encoded)
+        return transport
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "mode": self.mode,
+                "transports": {name: stats.as_dict() for name, stats in self._stats.items()},
+            }
+
+    def _choose(self, encoded: List[bytes], allow_stream: bool) -> str:
+        if not allow_stream or self.mode == LOAD:
+            return LOAD
+        if self.mode == STREAM:
+            return STREAM
+        if len(encoded) >= self.load_min_rows:
+            return LOAD
+        if sum(len(line) for line in encoded) >= self.load_min_bytes:
+            return LOAD
+        return STREAM
+
+    def _chunks(self, encoded: List[bytes]) -> List[List[int]]:
+        """Split row indexes into chunks bounded by row count and payload bytes"""
+        chunks, current, size = [], [], 0
+        for index, line in enumerate(encoded):
+            line_size = len(line)
+            if current and (len(current) >= self.chunk_rows or size + line_size > self.chunk_bytes):
+                chunks.append(current)
+                current, size = [], 0
+            current.append(index)
+            size += line_size
+        if current:
+            chunks.append(current)
+        return chunks
+
+    def _stream(self, table_id: str, rows: List[Dict], encoded: List[bytes]):
+        # Stable insert ids let BigQuery de-duplicate rows that are resent on retry
+        row_ids = [uuid.uuid4().hex for _ in rows]
+        for chunk in self._chunks(encoded):
+            self._stream_chunk(table_id, rows, encoded, row_ids, chunk)
+
+    def _stream_chunk(
+        self, table_id: str, rows: List[Dict], encoded: List[bytes], row_ids: List[str], chunk: List[int]
+    ):
+        pending = chunk
+        for attempt in range(1, self.max_attempts + 1):
+            start = time.perf_counter()
+            try:
+                errors = self.client.insert_rows_json(
+                    table_id,
+                    [rows[i] for i in pending],
+                    row_ids=[row_ids[i] for i in pending],
+                )
+            except Exception as e:
+                # The whole request failed; resend it with the same row ids
+                if not is_retryable(e) or attempt == self.max_attempts:
+                    with self._lock:
+                        self._stats[STREAM].failed_rows += len(pending)
+                    raise
+                with self._lock:
+                    self._stats[STREAM].retried_rows += len(pending)
+                print(f"Retrying streaming insert into {table_id} after {type(e).__name__}: {e} (attempt {attempt + 1})")
+                time.sleep(backoff_delay(attempt, 0.5, 10))
+                continue
+            elapsed = time.perf_counter() - start
+
+            failed, invalid = [], []
+            for error in errors:
+                index = pending[error["index"]]
+                reasons = {e.get("reason") for e in error.get("errors", [])}
+                # "stopped" rows were valid but rejected with an invalid row in the same request
+                (invalid if "invalid" in reasons else failed).append(index)
+            inserted = set(pending) - set(failed) - set(invalid)
+
+            with self._lock:
+                stats = self._stats[STREAM]
+                stats.requests += 1
+                stats.seconds += elapsed
+                stats.rows += len(inserted)
+                stats.bytes += sum(len(encoded[i]) for i in inserted)
+                stats.failed_rows += len(invalid)
+
+            if invalid:
+                raise RuntimeError(f"{len(invalid)} rows rejected by {table_id}: {errors[:3]}")
+            if not failed:
+                return
+            if attempt == self.max_attempts:
+                with self._lock:
+                    self._stats[STREAM].failed_rows += len(failed)
+                raise RuntimeError(
+                    f"{len(failed)} rows not inserted into {table_id} after {attempt} attempts: {errors[:3]}"
+                )
+
+            with self._lock:
+                self._stats[STREAM].retried_rows += len(failed)
+            print(f"Retrying {len(failed)} streaming inserts into {table_id} (attempt {attempt + 1})")
+            time.sleep(backoff_delay(attempt, 0.5, 10))
+            pending = failed
+
+    def _load(self, table_id: str, encoded: List[bytes]):
+        """
+        Append with one load job, retrying transient failures. The job id is
+        reused until a job is known to have failed, so a job created by an
+        attempt whose response was lost is awaited instead of loaded twice.
+        """
+        payload = b"\n".join(encoded)
+        start = time.perf_counter()
+        job_id = f"load_{uuid.uuid4().hex}"
+        for attempt in range(1, self.load_max_attempts + 1):
+            job = None
+            try:
+                try:
+                    job = self.client.load_table_from_file(
+                        BytesIO(payload),
+                        table_id,
+                        job_id=job_id,
+                        job_config=bigquery.LoadJobConfig(
+                            source_format=bigquery.SourceFormat.NEWLINE_DELIMITED_JSON,
+                            write_disposition="WRITE_APPEND"
+                        )
+                    )
+                except google_exceptions.Conflict:
+                    job = self.client.get_job(job_id)
+                job.result()
+                break
+            except Exception as e:
+                if not is_retryable(e) or attempt == self.load_max_attempts:
+                    with self._lock:
+                        self._stats[LOAD].failed_rows += len(encoded)
+                    raise
+                if job is not None and job.error_result:
+                    # The job ran and failed without appending; the retry is a new job
+                    job_id = f"load_{uuid.uuid4().hex}"
+                with self._lock:
+                    self._stats[LOAD].retried_rows += len(encoded)
+                print(f"Retrying load job into {table_id} after {type(e).__name__}: {e} (attempt {attempt + 1})")
+                time.sleep(backoff_delay(attempt, 1, 30))
+        with self._lock:
+            stats = self._stats[LOAD]
+            stats.requests += 1
+            stats.seconds += time.perf_counter() - start
+            stats.rows += len(encoded)
+            stats.bytes += len(payload)
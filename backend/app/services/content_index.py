@@ -0,0 +1,68 @@
+"""
+Content-addressed index of uploaded files
+"""
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+from app.core.cache import LRUCache, SQLiteStore
+from app.core.config import settings
+
+
+class ContentIndex:
+    """
+    Maps the SHA-256 of an upload's bytes to its parse result and
+    vectorization state. Metadata lookups are point reads against an
+    in-process LRU backed by a local SQLite store; parsed pages are only
+    kept in SQLite and read when a duplicate is actually reused.
+    """
+
+    def __init__(self, memory_size: int, store_path: str):
+        self.memory = LRUCache(memory_size)
+        self.store = SQLiteStore(store_path, table="contents")
+        self.page_store = SQLiteStore(store_path, table="content_pages")
+
+    def lookup(self, sha256: str) -> Optional[Dict]:
+        """Metadata (filename, page count, vectorized flag) for a content hash"""
+        entry = self.memory.get(sha256)
+        if entry is None:
+            entry = self.store.get(sha256)
+            if entry is not None:
+                entry = self._metadata(entry)
+                self.memory.set(sha256, entry)
+        return entry
+
+    def pages(self, sha256: str) -> Optional[List[Tuple[int, str]]]:
+        """Parsed (page_number, text) pages for a content hash, if recorded"""
+        pages = self.page_store.get(sha256)
+        if pages is None:
+            # Entries recorded before pages had their own table
+            pages = (self.store.get(sha256) or {}).get("pages")
+        return [(page_num, text) for page_num, text in pages] if pages is not None else None
+
+    def record(self, sha256: str, filename: str, pages: List[Tuple[int, str]], vectorized: bool = False) -> Dict:
+        """Store the parse result for a content hash, keeping an earlier vectorized flag"""
+        previous = self.lookup(sha256) or {}
+        entry = {
+            "sha256": sha256,
+            "filename": previous.get("filename", filename),
+            "page_count": len(pages),
+            "vectorized": vectorized or previous.get("vectorized", False),
+            "first_seen": previous.get("first_seen", datetime.now().isoformat()),
+        }
+        self.page_store.set(sha256, [[page_num, text] for page_num, text in pages])
+        self.store.set(sha256, entry)
+        self.memory.set(sha256, entry)
+        return entry
+
+    @staticmethod
+    def _metadata(entry: Dict) -> Dict:
+        metadata = {k: v for k, v in entry.items() if k != "pages"}
+        if "pages" in entry:
+            metadata.setdefault("page_count", len(entry["pages"]))
+        return metadata
+
+    def stats(self) -> Dict:
+        return {"memory": self.memory.stats(), "persistent": self.store.stats(), "pages": self.page_store.stats()}
+
+
+# Global content index instance
+content_index = ContentIndex(settings.CONTENT_INDEX_SIZE, settings.CONTENT_INDEX_PATH)
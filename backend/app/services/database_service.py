@@ -1,22 +1,50 @@
 """
 Database service for BigQuery operations
 """
-import json
+import time
 import uuid
-from typing import List, Dict, Optional
+import threading
+from collections import defaultdict
+from typing import Any, Callable, Iterator, List, Dict, Optional, Tuple
 from datetime import datetime
-from io import BytesIO
+import pyarrow
 from google.cloud import bigquery
-from app.core.database import get_bigquery_client
+from app.core.database import get_bigquery_client, get_bigquery_storage_client
 from app.core.config import settings
+from app.core.cache import LRUCache
+from app.core.schema import check_schema
 from app.core.exceptions import DatabaseError
+from app.services.write_behind import WriteBehindBuffer
+from app.services.bigquery_writer import BigQueryWriter
+
+_MISSING = object()
+
+TEST_CASE_COLUMNS = (
+    "file_id", "req_id", "req_title_id", "req_title", "req_description",
+    "tc_id", "tc_title", "tc_description", "expected_result", "input_data",
+    "compliance_tags", "risk", "created_at",
+)
+_TEST_CASE_DETAIL_COLUMNS = [
+    "tc_id", "tc_title", "tc_description", "expected_result",
+    "input_data", "compliance_tags", "risk", "created_at",
+]
+# Keyset position in the current test cases: (req_id, tc_id, row_seq)
+TestCaseKey = Tuple[str, str, int]
+
+# Compliance tags are stored as one string separated by '|' or comma
+_TAGS_SQL = "SPLIT(REPLACE(IFNULL(compliance_tags, ''), '|', ','), ',')"
+# Risk normalized like str.capitalize(), defaulting to Low
+_RISK_SQL = (
+    "CONCAT(UPPER(SUBSTR(IFNULL(NULLIF(risk, ''), 'Low'), 1, 1)), "
+    "LOWER(SUBSTR(IFNULL(NULLIF(risk, ''), 'Low'), 2)))"
+)
 
 
 class DatabaseService:
     def get_test_case_description(self, requirement_id: str, tc_id: str) -> Optional[str]:
         """Fetch original test case description from BigQuery"""
         try:
-            table_id = f"{self.project_id}.{self.dataset}.test_cases"
+            table_id = self._current_test_cases_table()
             query = f"SELECT tc_description FROM `{table_id}` WHERE req_id = @requirement_id AND tc_id = @tc_id LIMIT 1"
             job_config = bigquery.QueryJobConfig(
                 query_parameters=[
@@ -28,32 +56,128 @@ class DatabaseService:
             return rows[0].tc_description if rows else None
         except Exception as e:
             raise DatabaseError(f"Failed to fetch test case description: {str(e)}")
-    def update_test_case_description(self, requirement_id: str, tc_id: str, improved_description: str):
-        """Update test case description in BigQuery"""
-        try:
-            table_id = f"{self.project_id}.{self.dataset}.test_cases"
-            query = f"""
-                UPDATE `{table_id}`
-                SET tc_description = @improved_description
-                WHERE req_id = @requirement_id AND tc_id = @tc_id
-            """
-            job_config = bigquery.QueryJobConfig(
-                query_parameters=[
-                    bigquery.ScalarQueryParameter("improved_description", "STRING", improved_description),
-                    bigquery.ScalarQueryParameter("requirement_id", "STRING", requirement_id),
-                    bigquery.ScalarQueryParameter("tc_id", "STRING", tc_id)
-                ]
-            )
-            self.client.query(query, job_config=job_config)
-            print(f"Updated test case description for requirement_id={requirement_id}, tc_id={tc_id}")
-        except Exception as e:
-            raise DatabaseError(f"Failed to update test case description: {str(e)}")
+    def update_test_case_description(
+        self, requirement_id: str, tc_id: str, improved_description: str, wait: bool = False
+    ) -> int:
+        """
+        Queue a test case description update; it is written with the next
+        batched MERGE. Returns a sequence number for wait_for_writes; with
+        wait=True, blocks until the update is flushed.
+        """
+        seq = self._write_buffer.put("test_case_description", (requirement_id, tc_id), improved_description)
+        print(f"Queued test case description update for requirement_id={requirement_id}, tc_id={tc_id}")
+        if wait:
+            self.wait_for_writes(seq)
+        return seq
     """Service for BigQuery database operations"""
     
     def __init__(self):
         self.client = get_bigquery_client()
         self.project_id = settings.GCP_PROJECT_ID
         self.dataset = settings.BIGQUERY_DATASET
+        self.storage_client = get_bigquery_storage_client()
+        self._query_cache = LRUCache(settings.QUERY_CACHE_SIZE, ttl_seconds=settings.QUERY_CACHE_TTL_SECONDS)
+        # Requirements are never updated in place, so point lookups can be cached without a TTL
+        self._requirement_cache = LRUCache(settings.REQUIREMENT_CACHE_SIZE)
+        self._table_generations = defaultdict(int)
+        self._generation_lock = threading.Lock()
+        # File statuses and test case descriptions are MERGEd right after insert,
+        # which rows in the streaming buffer can't take
+        self._writer = BigQueryWriter(self.client, dml_tables=("files", "test_cases"))
+        self._schema_ready = False
+        # Type of test_cases.created_at; STRING until the table is migrated
+        self._test_case_created_at_type = "TIMESTAMP"
+        self._compaction_stop = threading.Event()
+        self._compaction_thread: Optional[threading.Thread] = None
+        
+        # Status and description updates are coalesced and written as batched MERGEs
+        self._write_buffer = WriteBehindBuffer(
+            settings.WRITE_BEHIND_FLUSH_SECONDS, max_attempts=settings.WRITE_BEHIND_MAX_ATTEMPTS
+        )
+        self._write_buffer.register("file_status", self._merge_file_statuses)
+        self._write_buffer.register("test_case_description", self._merge_test_case_descriptions)
+    
+    def _read_through(self, table: str, key: Tuple, loader: Callable[[], Any]) -> Any:
+        """
+        Return a cached query result for (table, key) or load and cache it.
+        Cached results are shared between callers and must not be mutated.
+        """
+        cache_key = (table,) + key
+        cached = self._query_cache.get(cache_key, _MISSING)
+        if cached is not _MISSING:
+            return cached
+        
+        with self._generation_lock:
+            generation = self._table_generations[table]
+        result = loader()
+        with self._generation_lock:
+            # Skip caching if a write to the table landed while we were reading
+            if self._table_generations[table] == generation:
+                self._query_cache.set(cache_key, result)
+        return result
+    
+    def _invalidate(self, table: str):
+        """Drop cached reads of a table after this service writes to it"""
+        with self._generation_lock:
+            self._table_generations[table] += 1
+            self._query_cache.invalidate(lambda key: key[0] == table)
+    
+    def _ensure_schema(self):
+        """
+        Check once per process that the tables, columns and views the
+        versioned test case storage needs exist. DDL stays out of the serving
+        path: it runs at startup with BIGQUERY_ENSURE_TABLES=true or through
+        `python -m app.core.schema`.
+        """
+        if self._schema_ready:
+            return
+        with self._generation_lock:
+            if not self._schema_ready:
+                problems = check_schema(self.client)
+                if problems:
+                    raise DatabaseError(
+                        f"BigQuery schema is out of date ({'; '.join(problems)}). "
+                        "Run `python -m app.core.schema` or start with BIGQUERY_ENSURE_TABLES=true"
+                    )
+                # ensure_tables only adds columns, so legacy tables keep created_at as STRING
+                table = self.client.get_table(f"{self.project_id}.{self.dataset}.test_cases")
+                self._test_case_created_at_type = next(
+                    (f.field_type for f in table.schema if f.name == "created_at"), "TIMESTAMP"
+                )
+                self._schema_ready = True
+    
+    def _current_test_cases_table(self) -> str:
+        """View over test_cases with superseded versions filtered out"""
+        self._ensure_schema()
+        return f"{self.project_id}.{self.dataset}.test_cases_current"
+    
+    def cache_stats(self) -> Dict:
+        """Hit-rate metrics for the query caches"""
+        return {
+            "queries": self._query_cache.stats(),
+            "requirements_by_id": self._requirement_cache.stats(),
+        }
+    
+    def write_buffer_stats(self) -> Dict:
+        """Pending, coalesced and failed buffered updates"""
+        return self._write_buffer.stats()
+    
+    def write_stats(self) -> Dict:
+        """Rows/sec and bytes appended per write transport"""
+        return self._writer.stats()
+    
+    def _query_batches(
+        self, query: str, job_config: Optional[bigquery.QueryJobConfig] = None
+    ) -> Iterator[pyarrow.RecordBatch]:
+        """
+        Run a query and return its result as Arrow record batches.
+        Uses the Storage Read API when available, otherwise REST pages.
+        The query runs before this returns; batches are fetched lazily.
+        """
+        rows = self.client.query(query, job_config=job_config).result(
+            page_size=settings.TEST_CASES_STREAM_PAGE_SIZE
+        )
+        return rows.to_arrow_iterable(bqstorage_client=self.storage_client)
     
     def save_file(self, file_id: str, filenames: str, extracted_data: str, input_data: str):
         """Save file information to BigQuery"""
@@ -65,42 +189,99 @@ class DatabaseService:
                 "filename": filenames,
                 "extracted_data": extracted_data,
                 "input_data": input_data,
-                "status": "Ingestion"
+                "status": "Ingestion",
+                "created_at": datetime.now().isoformat()
             }]
             
-            self._load_json_data(table_id, rows)
+            self._writer.write(table_id, rows)
+            self._invalidate("files")
             print(f"Inserted file record for {file_id}")
             
         except Exception as e:
             raise DatabaseError(f"Failed to save file: {str(e)}")
     
-    def update_file_status(self, file_id: str, new_status: str):
-        """Update file status in BigQuery"""
+    def update_file_status(self, file_id: str, new_status: str, wait: bool = False) -> int:
+        """
+        Queue a file status update; it is written with the next batched
+        MERGE. Returns a sequence number for wait_for_writes; with
+        wait=True, blocks until the update is flushed.
+        """
+        seq = self._write_buffer.put("file_status", file_id, new_status)
+        print(f"Queued status update for file_id={file_id} to '{new_status}'")
+        if wait:
+            self.wait_for_writes(seq)
+        return seq
+    
+    def wait_for_writes(self, seq: Optional[int] = None, timeout: Optional[float] = None):
+        """Block until buffered updates up to seq (default: all queued so far) are flushed"""
+        if seq is None:
+            seq = self._write_buffer.stats()["last_seq"]
         try:
-            table_id = f"{self.project_id}.{self.dataset}.files"
-            
-            query = f"""
-                UPDATE `{table_id}`
-                SET status = @new_status
-                WHERE id = @file_id
-            """
-            
-            job_config = bigquery.QueryJobConfig(
-                query_parameters=[
-                    bigquery.ScalarQueryParameter("new_status", "STRING", new_status),
-                    bigquery.ScalarQueryParameter("file_id", "STRING", file_id),
-                ]
+            flushed = self._write_buffer.wait_for(seq, timeout=timeout or settings.WRITE_BEHIND_WAIT_TIMEOUT_SECONDS)
+        except RuntimeError as e:
+            raise DatabaseError(str(e))
+        if not flushed:
+            raise DatabaseError("Timed out waiting for buffered updates to be written")
+    
+    def close(self):
+        """Flush buffered updates and stop compaction; called on application shutdown"""
+        self._compaction_stop.set()
+        self._write_buffer.close(timeout=settings.WRITE_BEHIND_WAIT_TIMEOUT_SECONDS)
+    
+    def _merge_file_statuses(self, updates: Dict[str, str]):
+        """Apply a batch of file status updates with one MERGE"""
+        table_id = f"{self.project_id}.{self.dataset}.files"
+        query = f"""
+            MERGE `{table_id}` T
+            USING UNNEST(@updates) S
+            ON T.id = S.id
+            WHEN MATCHED THEN UPDATE SET status = S.status
+        """
+        rows = [
+            bigquery.StructQueryParameter(
+                None,
+                bigquery.ScalarQueryParameter("id", "STRING", file_id),
+                bigquery.ScalarQueryParameter("status", "STRING", status),
             )
-            
-            query_job = self.client.query(query, job_config=job_config)
-            query_job.result()
-            
-            print(f"Updated status for file_id={file_id} to '{new_status}'")
-            
-        except Exception as e:
-            raise DatabaseError(f"Failed to update file status: {str(e)}")
+            for file_id, status in updates.items()
+        ]
+        job_config = bigquery.QueryJobConfig(
+            query_parameters=[bigquery.ArrayQueryParameter("updates", "STRUCT", rows)]
+        )
+        self.client.query(query, job_config=job_config).result()
+        self._invalidate("files")
+        print(f"Merged {len(updates)} file status updates")
+    
+    def _merge_test_case_descriptions(self, updates: Dict[Tuple[str, str], str]):
+        """Apply a batch of test case description updates with one MERGE"""
+        table_id = f"{self.project_id}.{self.dataset}.test_cases"
+        query = f"""
+            MERGE `{table_id}` T
+            USING UNNEST(@updates) S
+            ON T.req_id = S.req_id AND T.tc_id = S.tc_id AND T.superseded_at IS NULL
+            WHEN MATCHED THEN UPDATE SET tc_description = S.tc_description
+        """
+        rows = [
+            bigquery.StructQueryParameter(
+                None,
+                bigquery.ScalarQueryParameter("req_id", "STRING", req_id),
+                bigquery.ScalarQueryParameter("tc_id", "STRING", tc_id),
+                bigquery.ScalarQueryParameter("tc_description", "STRING", description),
+            )
+            for (req_id, tc_id), description in updates.items()
+        ]
+        job_config = bigquery.QueryJobConfig(
+            query_parameters=[bigquery.ArrayQueryParameter("updates", "STRUCT", rows)]
+        )
+        self.client.query(query, job_config=job_config).result()
+        self._invalidate("test_cases")
+        print(f"Merged {len(updates)} test case description updates")
     
     def get_files(self) -> List[Dict]:
+        """Get all uploaded files (cached until the table is written)"""
+        return self._read_through("files", ("get_files",), self._fetch_files)
+    
+    def _fetch_files(self) -> List[Dict]:
         """Get all uploaded files"""
         try:
             table_id = f"{self.project_id}.{self.dataset}.files"
@@ -157,53 +338,86 @@ class DatabaseService:
         """Save requirements to BigQuery"""
         try:
             table_id = f"{self.project_id}.{self.dataset}.requirements"
-            self._load_json_data(table_id, requirements_data)
+            self._writer.write(table_id, requirements_data)
+            self._invalidate("requirements")
             print(f"Inserted {len(requirements_data)} requirements")
             
         except Exception as e:
             raise DatabaseError(f"Failed to save requirements: {str(e)}")
     
-    def get_requirements(self) -> List[Dict]:
-        """Get all requirements (no file_id dependency)"""
+    def get_requirements(self, file_id: Optional[str] = None) -> List[Dict]:
+        """Get requirements, optionally only those of one file (cached until the table is written)"""
+        return self._read_through(
+            "requirements", ("get_requirements", file_id), lambda: self._fetch_requirements(file_id)
+        )
+    
+    def _fetch_requirements(self, file_id: Optional[str] = None) -> List[Dict]:
+        """Get requirements, scanning only the file's clustered rows when file_id is given"""
         try:
             table_id = f"{self.project_id}.{self.dataset}.requirements"
 
+            where = "WHERE file_id = @file_id" if file_id else ""
             query = f"""
                 SELECT requirement_id, req_title_id, title, description, file_id, 
                        type, source, category, priority 
                 FROM `{table_id}` 
+                {where}
                 ORDER BY req_title_id
             """
-            query_job = self.client.query(query)
-
-            rows = list(query_job)
+            job_config = bigquery.QueryJobConfig(
+                query_parameters=[bigquery.ScalarQueryParameter("file_id", "STRING", file_id)] if file_id else []
+            )
             return [
-                {
-                    "file_id": r.file_id,
-                    "requirement_id": r.requirement_id,
-                    "req_title_id": r.req_title_id,
-                    "title": r.title,
-                    "description": r.description,
-                    "type": r.type,
-                    "source": r.source,
-                    "category": r.category,
-                    "priority": r.priority
-                }
-                for r in rows
+                row
+                for batch in self._query_batches(query, job_config)
+                for row in batch.to_pylist()
             ]
 
         except Exception as e:
             raise DatabaseError(f"Failed to fetch requirements: {str(e)}")
     
+    def get_requirement_by_id(self, requirement_id: str) -> Optional[Dict]:
+        """Get a single requirement by its id"""
+        cached = self._requirement_cache.get(requirement_id)
+        if cached is not None:
+            return cached
+        
+        try:
+            table_id = f"{self.project_id}.{self.dataset}.requirements"
+            query = f"""
+                SELECT requirement_id, req_title_id, title, description, file_id,
+                       type, source, category, priority
+                FROM `{table_id}`
+                WHERE requirement_id = @requirement_id
+                LIMIT 1
+            """
+            job_config = bigquery.QueryJobConfig(
+                query_parameters=[bigquery.ScalarQueryParameter("requirement_id", "STRING", requirement_id)]
+            )
+            rows = list(self.client.query(query, job_config=job_config))
+        except Exception as e:
+            raise DatabaseError(f"Failed to fetch requirement: {str(e)}")
+        
+        if not rows:
+            return None
+        requirement = dict(rows[0].items())
+        self._requirement_cache.set(requirement_id, requirement)
+        return requirement
+    
     def save_test_cases(self, test_cases: List[Dict]):
-        """Save test cases to BigQuery"""
+        """
+        Save test cases to BigQuery. A test case whose (req_id, tc_id) already
+        exists supersedes the current row and is stored as its next version.
+        test_cases holds the complete new set of each requirement in it, so
+        current rows of those requirements that are not in the set are
+        superseded too.
+        """
         try:
-            table_id = f"{self.project_id}.{self.dataset}.test_cases"
-            
-            # Ensure all required fields are present
-            rows = []
+            # Ensure all required fields are present; the last row per key wins
+            rows = {}
             for tc in test_cases:
-                rows.append({
+                key = (tc.get("req_id", "") or "", tc.get("tc_id", "") or "")
+                rows[key] = {
                     "file_id": tc.get("file_id", "") or "",
                     "req_id": tc.get("req_id", "") or "",
                     "req_title_id": tc.get("req_title_id", "") or "",
@@ -217,21 +431,211 @@ class DatabaseService:
                     "compliance_tags": tc.get("compliance_tags", "") or "",
                     "risk": tc.get("risk", "") or "",
                     "created_at": tc.get("created_at") or datetime.now().isoformat(),
-                })
+                }
             
-            self._load_json_data(table_id, rows)
-            print(f"Inserted {len(rows)} test cases")
+            # A requirement's rows share one MERGE, which supersedes its tc_ids missing from them
+            by_requirement = defaultdict(list)
+            for row in rows.values():
+                by_requirement[row["req_id"]].append(row)
+            chunk = []
+            for requirement_rows in by_requirement.values():
+                if chunk and len(chunk) + len(requirement_rows) > settings.TEST_CASE_MERGE_CHUNK_ROWS:
+                    self._upsert_test_cases(chunk)
+                    chunk = []
+                chunk.extend(requirement_rows)
+            if chunk:
+                self._upsert_test_cases(chunk)
+            rows = list(rows.values())
+            self._invalidate("test_cases")
+            print(f"Upserted {len(rows)} test cases")
             
         except Exception as e:
             raise DatabaseError(f"Failed to save test cases: {str(e)}")
     
-    def get_test_cases_by_file(self, file_id: str ) -> Dict:
-        """Get test cases grouped by requirement for a file"""
+    def _upsert_test_cases(self, rows: List[Dict]):
+        """
+        Supersede current rows and insert the next versions with one MERGE;
+        current rows of the same requirements whose tc_id is not in rows
+        are superseded as well
+        """
+        self._ensure_schema()
+        table_id = f"{self.project_id}.{self.dataset}.test_cases"
+        columns = [c for c in TEST_CASE_COLUMNS if c != "created_at"]
+        # Rows arrive with ISO strings; match whatever type the table has
+        created_at = "S.created_at" if self._test_case_created_at_type == "STRING" else "CAST(S.created_at AS TIMESTAMP)"
+        query = f"""
+            MERGE `{table_id}` T
+            USING (
+                WITH incoming AS (
+                    SELECT * FROM UNNEST(@rows)
+                ),
+                current_versions AS (
+                    SELECT req_id, tc_id, MAX(IFNULL(version, 1)) AS version
+                    FROM `{table_id}`
+                    WHERE superseded_at IS NULL
+                      AND req_id IN (SELECT DISTINCT req_id FROM incoming)
+                    GROUP BY req_id, tc_id
+                ),
+                staged AS (
+                    SELECT I.*, IFNULL(C.version, 0) + 1 AS next_version
+                    FROM incoming I
+                    LEFT JOIN current_versions C USING (req_id, tc_id)
+                ),
+                dropped AS (
+                    SELECT C.req_id, C.tc_id
+                    FROM current_versions C
+                    LEFT JOIN incoming I USING (req_id, tc_id)
+                    WHERE I.req_id IS NULL
+                )
+                -- Every row appears twice: keyed, to supersede the current version,
+                -- and with a NULL key that never matches, to insert the new version.
+                -- Dropped tc_ids only appear keyed.
+                SELECT req_id AS merge_req_id, tc_id AS merge_tc_id, * FROM staged
+                UNION ALL
+                SELECT NULL, NULL, * FROM staged
+                UNION ALL
+                SELECT req_id, tc_id, {", ".join(f"CAST(NULL AS STRING) AS {c}" for c in TEST_CASE_COLUMNS)},
+                       CAST(NULL AS INT64) AS next_version
+                FROM dropped
+            ) S
+            ON T.req_id = S.merge_req_id AND T.tc_id = S.merge_tc_id AND T.superseded_at IS NULL
+            WHEN MATCHED THEN
+                UPDATE SET superseded_at = CURRENT_TIMESTAMP()
+            WHEN NOT MATCHED AND S.merge_req_id IS NULL THEN
+                INSERT ({", ".join(columns)}, created_at, version, superseded_at)
+                VALUES ({", ".join(f"S.{c}" for c in columns)}, {created_at}, S.next_version, NULL)
+        """
+        params = [
+            bigquery.StructQueryParameter(
+                None, *(bigquery.ScalarQueryParameter(c, "STRING", row[c]) for c in TEST_CASE_COLUMNS)
+            )
+            for row in rows
+        ]
+        job_config = bigquery.QueryJobConfig(
+            query_parameters=[bigquery.ArrayQueryParameter("rows", "STRUCT", params)]
+        )
+        for attempt in range(1, 4):
+            try:
+                self.client.query(query, job_config=job_config).result()
+                return
+            except Exception as e:
+                # Concurrent MERGEs into the same partitions can abort each other
+                if "Could not serialize access" not in str(e) or attempt == 3:
+                    raise
+                print(f"Retrying test case upsert after concurrent update (attempt {attempt + 1})")
+                time.sleep(attempt)
+    
+    def compact_test_cases(self, retention_hours: Optional[float] = None) -> int:
+        """Delete superseded test case versions older than the retention window; returns rows deleted"""
         try:
+            self._ensure_schema()
             table_id = f"{self.project_id}.{self.dataset}.test_cases"
+            hours = settings.TEST_CASE_HISTORY_RETENTION_HOURS if retention_hours is None else retention_hours
             query = f"""
-                SELECT * 
+                DELETE FROM `{table_id}`
+                WHERE superseded_at IS NOT NULL
+                  AND superseded_at < TIMESTAMP_SUB(CURRENT_TIMESTAMP(), INTERVAL @minutes MINUTE)
+            """
+            job_config = bigquery.QueryJobConfig(
+                query_parameters=[bigquery.ScalarQueryParameter("minutes", "INT64", int(hours * 60))]
+            )
+            job = self.client.query(query, job_config=job_config)
+            job.result()
+            deleted = job.num_dml_affected_rows or 0
+            print(f"Compacted test_cases: deleted {deleted} superseded rows")
+            return deleted
+            
+        except Exception as e:
+            raise DatabaseError(f"Failed to compact test cases: {str(e)}")
+    
+    def start_compaction(self, interval_hours: Optional[float] = None):
+        """Run compact_test_cases on a background thread every interval_hours"""
+        interval = (interval_hours or settings.TEST_CASE_COMPACTION_INTERVAL_HOURS) * 3600
+        if interval <= 0 or self._compaction_thread:
+            return
+        
+        def run():
+            while not self._compaction_stop.wait(interval):
+                try:
+                    self.compact_test_cases()
+                except Exception as e:
+                    print(f"Scheduled test case compaction failed: {e}")
+        
+        self._compaction_thread = threading.Thread(target=run, name="test-case-compaction", daemon=True)
+        self._compaction_thread.start()
+    
+    def save_generation_checkpoints(self, checkpoints: List[Dict]):
+        """Append per-requirement generation checkpoints"""
+        try:
+            self._ensure_schema()
+            table_id = f"{self.project_id}.{self.dataset}.generation_checkpoints"
+            self._writer.write(table_id, checkpoints)
+            print(f"Saved {len(checkpoints)} generation checkpoints")
+            
+        except Exception as e:
+            raise DatabaseError(f"Failed to save generation checkpoints: {str(e)}")
+    
+    def get_generation_status(self, file_id: str) -> List[Dict]:
+        """
+        Per-requirement generation state of a file. A requirement is done when
+        test cases for it are saved, otherwise its latest checkpoint status
+        (error/empty) applies, or pending if it has never been attempted.
+        """
+        try:
+            self._ensure_schema()
+            dataset = f"{self.project_id}.{self.dataset}"
+            query = f"""
+                WITH latest AS (
+                    SELECT req_id, status, error, run_id, created_at,
+                           COUNT(*) OVER (PARTITION BY req_id) AS attempts
+                    FROM `{dataset}.generation_checkpoints`
+                    WHERE file_id = @file_id
+                    QUALIFY ROW_NUMBER() OVER (PARTITION BY req_id ORDER BY created_at DESC) = 1
+                ),
+                saved AS (
+                    SELECT req_id, COUNT(*) AS saved_test_cases
+                    FROM `{dataset}.test_cases_current`
+                    WHERE file_id = @file_id
+                    GROUP BY req_id
+                )
+                SELECT r.requirement_id, r.title,
+                       l.status, l.error, l.run_id, l.created_at AS updated_at,
+                       IFNULL(l.attempts, 0) AS attempts,
+                       IFNULL(s.saved_test_cases, 0) AS saved_test_cases
+                FROM `{dataset}.requirements` r
+                LEFT JOIN latest l ON l.req_id = r.requirement_id
+                LEFT JOIN saved s ON s.req_id = r.requirement_id
+                WHERE r.file_id = @file_id
+                ORDER BY r.req_title_id
+            """
+            job_config = bigquery.QueryJobConfig(
+                query_parameters=[bigquery.ScalarQueryParameter("file_id", "STRING", file_id)]
+            )
+            rows = [dict(row.items()) for row in self.client.query(query, job_config=job_config)]
+            for row in rows:
+                if row["saved_test_cases"]:
+                    row["status"], row["error"] = "done", None
+                elif row["status"] in (None, "done"):
+                    row["status"] = "pending"
+            return rows
+            
+        except Exception as e:
+            raise DatabaseError(f"Failed to fetch generation status: {str(e)}")
+    
+    def get_test_cases_by_file(self, file_id: str) -> Dict:
+        """Get test cases grouped by requirement for a file (cached until the table is written)"""
+        return self._read_through(
+            "test_cases", ("get_test_cases_by_file", file_id), lambda: self._fetch_test_cases_by_file(file_id)
+        )
+    
+    def _fetch_test_cases_by_file(self, file_id: str) -> Dict:
+        """Get test cases grouped by requirement for a file"""
+        try:
+            table_id = self._current_test_cases_table()
+            query = f"""
+                SELECT {", ".join(TEST_CASE_COLUMNS)}
                 FROM `{table_id}`
+                WHERE file_id = @file_id
                 ORDER BY req_id, tc_id
             """
             
@@ -239,29 +643,20 @@ class DatabaseService:
                 query_parameters=[bigquery.ScalarQueryParameter("file_id", "STRING", file_id)]
             )
             
-            rows = list(self.client.query(query, job_config=job_config))
-            
             requirements = {}
-            for r in rows:
-                if r.req_id not in requirements:
-                    requirements[r.req_id] = {
-                        "requirement_id": r.req_id,
-                        "req_title_id": r.req_title_id,
-                        "req_title": r.req_title,
-                        "requirement_description": r.req_description,
-                        "test_cases": []
-                    }
-                
-                requirements[r.req_id]["test_cases"].append({
-                    "tc_id": r.tc_id,
-                    "tc_title": r.tc_title,
-                    "tc_description": r.tc_description,
-                    "expected_result": r.expected_result,
-                    "input_data": r.input_data,
-                    "compliance_tags": r.compliance_tags,
-                    "risk": r.risk,
-                    "created_at": r.created_at,
-                })
+            for batch in self._query_batches(query, job_config):
+                columns = batch.select(["req_id", "req_title_id", "req_title", "req_description"]).to_pydict()
+                test_cases = batch.select(_TEST_CASE_DETAIL_COLUMNS).to_pylist()
+                for i, (req_id, tc) in enumerate(zip(columns["req_id"], test_cases)):
+                    if req_id not in requirements:
+                        requirements[req_id] = {
+                            "requirement_id": req_id,
+                            "req_title_id": columns["req_title_id"][i],
+                            "req_title": columns["req_title"][i],
+                            "requirement_description": columns["req_description"][i],
+                            "test_cases": []
+                        }
+                    requirements[req_id]["test_cases"].append(tc)
             
             return {"file_id": file_id, "requirements": list(requirements.values())}
             
@@ -269,125 +664,250 @@ class DatabaseService:
             raise DatabaseError(f"Failed to fetch test cases for file: {str(e)}")
 
     def get_all_test_cases(self) -> List[Dict]:
+        """Get a flat list of all test cases across all files (cached until the table is written)"""
+        return self._read_through("test_cases", ("get_all_test_cases",), self._fetch_all_test_cases)
+    
+    def _fetch_all_test_cases(self) -> List[Dict]:
         """Get a flat list of all test cases across all files"""
         try:
-            table_id = f"{self.project_id}.{self.dataset}.test_cases"
+            table_id = self._current_test_cases_table()
             query = f"""
-                SELECT *
+                SELECT {", ".join(TEST_CASE_COLUMNS)}
                 FROM `{table_id}`
                 ORDER BY req_id, tc_id
             """
 
-            query_job = self.client.query(query)
-            rows = list(query_job)
-
             return [
-                {
-                    "file_id": r.file_id,
-                    "req_id": r.req_id,
-                    "req_title_id": r.req_title_id,
-                    "req_title": r.req_title,
-                    "req_description": r.req_description,
-                    "tc_id": r.tc_id,
-                    "tc_title": r.tc_title,
-                    "tc_description": r.tc_description,
-                    "expected_result": r.expected_result,
-                    "input_data": r.input_data,
-                    "compliance_tags": r.compliance_tags,
-                    "risk": r.risk,
-                    "created_at": r.created_at,
-                }
-                for r in rows
+                row
+                for batch in self._query_batches(query)
+                for row in batch.to_pylist()
             ]
 
         except Exception as e:
             raise DatabaseError(f"Failed to fetch all test cases: {str(e)}")
 
-    def get_compliance_metrics(self) -> Dict:
-        """Get compliance and risk metrics across all files"""
+    def iter_test_case_batches(
+        self,
+        fields: Optional[List[str]] = None,
+        after: Optional[TestCaseKey] = None,
+        limit: Optional[int] = None,
+    ) -> Iterator[List[Dict]]:
+        """
+        Run a keyset-paginated test case query and return an iterator over
+        row batches. Rows are ordered by (req_id, tc_id) and start after the
+        `after` key; only the requested columns are selected, plus req_id
+        and tc_id. The query runs before this returns; batches are fetched lazily.
+        """
+        columns = self._project_test_case_columns(fields)
+        batches = self._query_test_case_keyset(columns, after, limit)
+        return (batch.select(columns).to_pylist() for batch in batches)
+
+    def iter_test_cases(
+        self,
+        fields: Optional[List[str]] = None,
+        after: Optional[TestCaseKey] = None,
+        limit: Optional[int] = None,
+    ) -> Iterator[Dict]:
+        """Row-by-row view of iter_test_case_batches"""
+        batches = self.iter_test_case_batches(fields, after, limit)
+        return (row for batch in batches for row in batch)
+
+    def get_test_cases_page(
+        self,
+        fields: Optional[List[str]] = None,
+        after: Optional[TestCaseKey] = None,
+        limit: int = 1000,
+    ) -> Tuple[List[Dict], Optional[TestCaseKey]]:
+        """Get one page of test cases and the (req_id, tc_id, row_seq) key to continue after, if any"""
+        columns = self._project_test_case_columns(fields)
+        rows = [
+            row
+            for batch in self._query_test_case_keyset(columns, after, limit + 1)
+            for row in batch.to_pylist()
+        ]
+        if len(rows) <= limit:
+            return [self._strip_row_seq(row) for row in rows], None
+        last = rows[limit - 1]
+        next_key = (last["req_id"], last["tc_id"], last["_row_seq"])
+        return [self._strip_row_seq(row) for row in rows[:limit]], next_key
+
+    def _query_test_case_keyset(
+        self,
+        columns: List[str],
+        after: Optional[TestCaseKey],
+        limit: Optional[int],
+    ) -> Iterator[pyarrow.RecordBatch]:
+        """
+        Keyset query over the current test cases. (req_id, tc_id) is not unique
+        while duplicate current rows exist, so each row also gets _row_seq, its
+        position among rows with the same key ordered by full row content.
+        Identical rows are interchangeable, so the order is stable across pages.
+        """
         try:
-            table_id = f"{self.project_id}.{self.dataset}.test_cases"
+            table_id = self._current_test_cases_table()
+            params = []
+            inner_where = ""
+            where = ""
+            if after:
+                # Whole (req_id, tc_id) groups are kept so _row_seq is numbered over all of them
+                inner_where = "WHERE req_id >= @after_req_id"
+                where = """WHERE req_id > @after_req_id
+                    OR (req_id = @after_req_id AND (
+                        tc_id > @after_tc_id OR (tc_id = @after_tc_id AND _row_seq > @after_row_seq)
+                    ))"""
+                params += [
+                    bigquery.ScalarQueryParameter("after_req_id", "STRING", after[0]),
+                    bigquery.ScalarQueryParameter("after_tc_id", "STRING", after[1]),
+                    bigquery.ScalarQueryParameter("after_row_seq", "INT64", after[2]),
+                ]
+            limit_clause = ""
+            if limit is not None:
+                limit_clause = "LIMIT @limit"
+                params.append(bigquery.ScalarQueryParameter("limit", "INT64", limit))
 
-            # Select all test cases across all files
             query = f"""
-                SELECT compliance_tags, risk, created_at
-                FROM `{table_id}`
+                SELECT {", ".join(columns)}, _row_seq
+                FROM (
+                    SELECT t.*, ROW_NUMBER() OVER (
+                        PARTITION BY req_id, tc_id ORDER BY TO_JSON_STRING(t)
+                    ) AS _row_seq
+                    FROM `{table_id}` t
+                    {inner_where}
+                )
+                {where}
+                ORDER BY req_id, tc_id, _row_seq
+                {limit_clause}
             """
+            return self._query_batches(query, bigquery.QueryJobConfig(query_parameters=params))
+        except Exception as e:
+            raise DatabaseError(f"Failed to fetch test cases: {str(e)}")
 
-            query_job = self.client.query(query)
-            rows = list(query_job)
-
-            if not rows:
-                return {
-                    "file_id": "all",
-                    "total_test_cases": 0,
-                    "compliance_tags": [],
-                    "compliance_counts": {},
-                    "risk_counts": {},
-                    "last_updated": None,
-                    "test_cases": []  # Always return test_cases key for UI compatibility
-                }
+    @staticmethod
+    def _strip_row_seq(row: Dict) -> Dict:
+        row.pop("_row_seq", None)
+        return row
 
-            total_test_cases = len(rows)
-            compliance_counts = {}
-            risk_counts = {"Critical": 0, "High": 0, "Medium": 0, "Low": 0}
-            all_tags = set()
-            last_updated = None
-            test_cases = []
+    @staticmethod
+    def _project_test_case_columns(fields: Optional[List[str]]) -> List[str]:
+        """Validate a field list; the keyset columns are always included"""
+        if not fields:
+            return list(TEST_CASE_COLUMNS)
+        unknown = [f for f in fields if f not in TEST_CASE_COLUMNS]
+        if unknown:
+            raise ValueError(f"Unknown test case fields: {', '.join(unknown)}")
+        return [c for c in TEST_CASE_COLUMNS if c in fields or c in ("req_id", "tc_id")]
 
-            for r in rows:
-                raw_tags = r.compliance_tags or ""
-                # Support tags separated by '|' or comma
-                tags = [t.strip() for part in raw_tags.split("|") for t in part.split(",") if t.strip()]
-                for tag in tags:
-                    compliance_counts[tag] = compliance_counts.get(tag, 0) + 1
-                    all_tags.add(tag)
+    def get_compliance_metrics(self) -> Dict:
+        """Get compliance and risk metrics across all files (cached until the table is written)"""
+        return self._read_through("test_cases", ("get_compliance_metrics",), self._fetch_compliance_metrics)
+    
+    def _fetch_compliance_metrics(self) -> Dict:
+        """Get compliance and risk metrics across all files"""
+        try:
+            table_id = self._current_test_cases_table()
 
-                risk = (r.risk or "Low").capitalize()
-                if risk in risk_counts:
-                    risk_counts[risk] += 1
+            # Aggregate in BigQuery so only the counts leave the warehouse
+            query = f"""
+                WITH base AS (
+                    SELECT
+                        compliance_tags,
+                        {_RISK_SQL} AS risk,
+                        SAFE_CAST(CAST(created_at AS STRING) AS TIMESTAMP) AS created_ts
+                    FROM `{table_id}`
+                ),
+                tags AS (
+                    SELECT TRIM(tag) AS tag
+                    FROM base, UNNEST({_TAGS_SQL}) AS tag
+                )
+                SELECT
+                    (SELECT COUNT(*) FROM base) AS total_test_cases,
+                    (SELECT MAX(created_ts) FROM base) AS last_updated,
+                    ARRAY(
+                        SELECT AS STRUCT tag, COUNT(*) AS n
+                        FROM tags WHERE tag != ''
+                        GROUP BY tag ORDER BY tag
+                    ) AS compliance_counts,
+                    ARRAY(
+                        SELECT AS STRUCT risk, COUNT(*) AS n
+                        FROM base GROUP BY risk
+                    ) AS risk_counts
+            """
 
-                if r.created_at:
-                    try:
-                        dt = datetime.fromisoformat(r.created_at)
-                        if not last_updated or dt > last_updated:
-                            last_updated = dt
-                    except Exception:
-                        pass
+            row = list(self.client.query(query))[0]
 
-                # Add each test case for UI filtering
-                test_cases.append({
-                    "compliance_tags": tags,
-                    "risk": r.risk,
-                    "created_at": r.created_at
-                })
+            compliance_counts = {t["tag"]: t["n"] for t in row.compliance_counts}
+            risk_counts = {"Critical": 0, "High": 0, "Medium": 0, "Low": 0}
+            for r in row.risk_counts:
+                if r["risk"] in risk_counts:
+                    risk_counts[r["risk"]] = r["n"]
 
             return {
                 "file_id": "all",  # Always return "all" since we're showing aggregated metrics
-                "total_test_cases": total_test_cases,
-                "compliance_tags": sorted(list(all_tags)),
+                "total_test_cases": row.total_test_cases,
+                "compliance_tags": sorted(compliance_counts),
                 "compliance_counts": compliance_counts,
                 "risk_counts": risk_counts,
-                "last_updated": last_updated.isoformat() if last_updated else None,
-                "test_cases": test_cases  # Provide test_cases for UI filtering
+                "last_updated": row.last_updated.isoformat() if row.last_updated else None,
             }
         except Exception as e:
             raise DatabaseError(f"Failed to fetch compliance metrics: {str(e)}")
-    
-    def _load_json_data(self, table_id: str, rows: List[Dict]):
-        """Load JSON data into BigQuery table"""
-        json_data = "\n".join(json.dumps(row) for row in rows)
-        file_obj = BytesIO(json_data.encode("utf-8"))
-        
-        job = self.client.load_table_from_file(
-            file_obj,
-            table_id,
-            job_config=bigquery.LoadJobConfig(
-                source_format=bigquery.SourceFormat.NEWLINE_DELIMITED_JSON,
-                write_disposition="WRITE_APPEND"
-            )
+
+    def get_compliance_test_cases(
+        self, tag: Optional[str] = None, risk: Optional[str] = None, limit: int = 100, offset: int = 0
+    ) -> Dict:
+        """Get one page of test cases for compliance filtering, optionally by tag and risk"""
+        return self._read_through(
+            "test_cases",
+            ("get_compliance_test_cases", tag, risk, limit, offset),
+            lambda: self._fetch_compliance_test_cases(tag, risk, limit, offset),
         )
-        job.result()
+
+    def _fetch_compliance_test_cases(self, tag: Optional[str], risk: Optional[str], limit: int, offset: int) -> Dict:
+        try:
+            table_id = self._current_test_cases_table()
+            query = f"""
+                SELECT req_id, tc_id, tc_title, compliance_tags, {_RISK_SQL} AS risk, created_at
+                FROM `{table_id}`
+                WHERE (@tag IS NULL OR @tag IN (SELECT TRIM(t) FROM UNNEST({_TAGS_SQL}) AS t))
+                  AND (@risk IS NULL OR LOWER({_RISK_SQL}) = LOWER(@risk))
+                ORDER BY req_id, tc_id
+                LIMIT @limit OFFSET @offset
+            """
+
+            # Fetch one extra row to know whether another page exists
+            job_config = bigquery.QueryJobConfig(
+                query_parameters=[
+                    bigquery.ScalarQueryParameter("tag", "STRING", tag),
+                    bigquery.ScalarQueryParameter("risk", "STRING", risk),
+                    bigquery.ScalarQueryParameter("limit", "INT64", limit + 1),
+                    bigquery.ScalarQueryParameter("offset", "INT64", offset),
+                ]
+            )
+            rows = list(self.client.query(query, job_config=job_config))
+
+            items = [
+                {
+                    "req_id": r.req_id,
+                    "tc_id": r.tc_id,
+                    "tc_title": r.tc_title,
+                    # Support tags separated by '|' or comma
+                    "compliance_tags": [
+                        t.strip() for part in (r.compliance_tags or "").split("|")
+                        for t in part.split(",") if t.strip()
+                    ],
+                    "risk": r.risk,
+                    "created_at": r.created_at,
+                }
+                for r in rows[:limit]
+            ]
+            return {
+                "items": items,
+                "limit": limit,
+                "offset": offset,
+                "next_offset": offset + limit if len(rows) > limit else None,
+            }
+        except Exception as e:
+            raise DatabaseError(f"Failed to fetch compliance test cases: {str(e)}")
 
 
 # Global database service instance
@@ -2,14 +2,70 @@
 Document parsing and processing service
 """
 import os
+import re
 import json
+import uuid
 import tempfile
-from typing import Dict, Any
+import threading
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from typing import Dict, Any, BinaryIO, Iterable, Iterator, List, Optional, Tuple
 from io import BytesIO
+import xml.etree.ElementTree as ET
 import PyPDF2
 from docx import Document
+from app.core.config import settings
 from app.core.exceptions import DocumentProcessingError
 
+# Separates pages in flattened text; removed from page text so it is never ambiguous
+PAGE_BREAK = "\f"
+_PAGE_MARKER = re.compile(r"(\d+) text ")
+
+_pdf_pool: ProcessPoolExecutor = None
+_pdf_pool_lock = threading.Lock()
+
+
+def _get_pdf_pool() -> ProcessPoolExecutor:
+    """Lazily create the process pool used for large PDFs"""
+    global _pdf_pool
+    with _pdf_pool_lock:
+        if _pdf_pool is None:
+            # spawn avoids forking a process that already runs gRPC/HTTP client threads
+            _pdf_pool = ProcessPoolExecutor(
+                max_workers=settings.PDF_PROCESS_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return _pdf_pool
+
+
+def shutdown_pdf_pool():
+    """Stop PDF worker processes, if any were started"""
+    global _pdf_pool
+    with _pdf_pool_lock:
+        if _pdf_pool is not None:
+            _pdf_pool.shutdown(wait=False, cancel_futures=True)
+            _pdf_pool = None
+
+
+# Per worker process: the PDF it parsed last, as (path, reader)
+_worker_pdf: Optional[Tuple[str, PyPDF2.PdfReader]] = None
+
+
+def _extract_pdf_page_range(path: str, start: int, stop: int) -> List[Tuple[int, str]]:
+    """
+    Extract text of pages [start, stop) of the PDF at path; runs in a worker
+    process. Each worker reads and parses a document once and reuses the
+    reader for the following ranges of the same file.
+    """
+    global _worker_pdf
+    if _worker_pdf is None or _worker_pdf[0] != path:
+        with open(path, "rb") as f:
+            _worker_pdf = (path, PyPDF2.PdfReader(BytesIO(f.read())))
+    reader = _worker_pdf[1]
+    return [(n + 1, reader.pages[n].extract_text() or "") for n in range(start, stop)]
+
 
 class DocumentService:
     """Service for parsing various document formats"""
@@ -31,78 +87,115 @@ class DocumentService:
             return str(data)
     
     @staticmethod
-    def parse_pdf(file_bytes: bytes) -> Dict[str, Any]:
-        """Parse PDF file and extract text"""
+    def iter_pdf_pages(file_bytes: bytes) -> Iterator[Tuple[int, str]]:
+        """
+        Yield (page_number, text) for each PDF page in order.
+        Large PDFs are split into page ranges extracted on a process pool,
+        with a bounded number of ranges in flight.
+        """
         try:
-            pdf_file = BytesIO(file_bytes)
-            pdf_reader = PyPDF2.PdfReader(pdf_file)
-            
-            pages = []
-            for page_num, page in enumerate(pdf_reader.pages):
-                text = page.extract_text()
-                pages.append({
-                    "page": page_num + 1,
-                    "items": [{"type": "text", "content": text}]
-                })
-            
-            return {"pages": pages}
+            reader = PyPDF2.PdfReader(BytesIO(file_bytes))
+            page_count = len(reader.pages)
+            workers = settings.PDF_PROCESS_WORKERS
+
+            if workers <= 1 or page_count < settings.PDF_PARALLEL_MIN_PAGES:
+                for page_num, page in enumerate(reader.pages):
+                    yield page_num + 1, page.extract_text() or ""
+                return
+            del reader
+
+            # Workers read the document from a temporary file instead of
+            # receiving the bytes with every page range; the unique name
+            # keeps a worker from reusing a reader cached for another file
+            with tempfile.NamedTemporaryFile(prefix=f"{uuid.uuid4().hex}-", suffix=".pdf", delete=False) as f:
+                f.write(file_bytes)
+                path = f.name
+            pending = deque()
+            try:
+                step = max(1, settings.PDF_PAGES_PER_TASK)
+                ranges = iter((start, min(start + step, page_count)) for start in range(0, page_count, step))
+                pool = _get_pdf_pool()
+
+                pending.extend(
+                    pool.submit(_extract_pdf_page_range, path, start, stop)
+                    for start, stop in islice(ranges, workers * 2)
+                )
+                while pending:
+                    pages = pending.popleft().result()
+                    next_range = next(ranges, None)
+                    if next_range:
+                        pending.append(pool.submit(_extract_pdf_page_range, path, *next_range))
+                    yield from pages
+            finally:
+                for future in pending:
+                    future.cancel()
+                os.unlink(path)
         except Exception as e:
             raise DocumentProcessingError(f"PDF parsing failed: {str(e)}")
+
+    @staticmethod
+    def parse_pdf(file_bytes: bytes) -> Dict[str, Any]:
+        """Parse PDF file and extract text"""
+        pages = [
+            {"page": page_num, "items": [{"type": "text", "content": text}]}
+            for page_num, text in DocumentService.iter_pdf_pages(file_bytes)
+        ]
+        return {"pages": pages}
     
     @staticmethod
     def parse_word(file_bytes: bytes) -> Dict[str, Any]:
         """Parse Word document and extract text"""
         try:
-            # Create temporary file for docx parsing
-            with tempfile.NamedTemporaryFile(delete=False, suffix='.docx') as tmp:
-                tmp.write(file_bytes)
-                tmp.flush()
-                
-                doc = Document(tmp.name)
-                text_content = []
-                
-                for paragraph in doc.paragraphs:
-                    if paragraph.text.strip():
-                        text_content.append(paragraph.text)
-                
-                # Clean up temp file
-                os.unlink(tmp.name)
-                
-                full_text = "\n".join(text_content)
-                return {
-                    "pages": [{"page": 1, "items": [{"type": "text", "content": full_text}]}]
-                }
+            doc = Document(BytesIO(file_bytes))
+            text_content = [p.text for p in doc.paragraphs if p.text.strip()]
+            
+            full_text = "\n".join(text_content)
+            return {
+                "pages": [{"page": 1, "items": [{"type": "text", "content": full_text}]}]
+            }
         except Exception as e:
             raise DocumentProcessingError(f"Word document parsing failed: {str(e)}")
     
+    @staticmethod
+    def iter_xml_text(source: BinaryIO) -> Iterator[str]:
+        """
+        Yield element text in document order from an XML stream.
+        Uses iterparse and clears finished elements, so memory stays bounded
+        by tree depth rather than document size.
+        """
+        # An element's text is complete once its first child starts or it ends,
+        # so text is emitted at whichever comes first, in document order.
+        open_elements = []
+        emitted = []
+        for event, elem in ET.iterparse(source, events=("start", "end")):
+            if event == "start":
+                if open_elements and not emitted[-1]:
+                    emitted[-1] = True
+                    text = (open_elements[-1].text or "").strip()
+                    if text:
+                        yield text
+                open_elements.append(elem)
+                emitted.append(False)
+                continue
+            
+            if not emitted.pop():
+                text = (elem.text or "").strip()
+                if text:
+                    yield text
+            open_elements.pop()
+            elem.clear()
+            if open_elements:
+                # A finished element is always its parent's last child so far
+                del open_elements[-1][-1]
+    
     @staticmethod
     def parse_xml(file_bytes: bytes) -> Dict[str, Any]:
         """Parse XML file and extract text"""
         try:
-            import xml.etree.ElementTree as ET
-            
-            # Create temporary file for XML parsing
-            with tempfile.NamedTemporaryFile(delete=False, suffix='.xml') as tmp:
-                tmp.write(file_bytes)
-                tmp.flush()
-                
-                tree = ET.parse(tmp.name)
-                root = tree.getroot()
-                
-                def extract_text_from_element(element):
-                    text = element.text or ""
-                    for child in element:
-                        text += " " + extract_text_from_element(child)
-                    return text.strip()
-                
-                content = extract_text_from_element(root)
-                
-                # Clean up temp file
-                os.unlink(tmp.name)
-                
-                return {
-                    "pages": [{"page": 1, "items": [{"type": "text", "content": content}]}]
-                }
+            content = " ".join(DocumentService.iter_xml_text(BytesIO(file_bytes)))
+            return {
+                "pages": [{"page": 1, "items": [{"type": "text", "content": content}]}]
+            }
         except Exception as e:
             raise DocumentProcessingError(f"XML parsing failed: {str(e)}")
     
@@ -118,15 +211,17 @@ class DocumentService:
             raise DocumentProcessingError(f"Markup parsing failed: {str(e)}")
     
     @staticmethod
-    def extract_text_from_bytes(filename: str, file_bytes: bytes) -> str:
+    def iter_pages(filename: str, file_bytes: bytes) -> Iterator[Tuple[int, str]]:
         """
-        Extract and flatten text from uploaded file bytes
+        Yield (page_number, text) for an uploaded file.
+        PDFs are streamed page by page; other formats yield a single page.
         """
         ext = os.path.splitext(filename)[1].lower()
         
         try:
             if ext == ".pdf":
-                parsed = DocumentService.parse_pdf(file_bytes)
+                yield from DocumentService.iter_pdf_pages(file_bytes)
+                return
             elif ext == ".docx":
                 parsed = DocumentService.parse_word(file_bytes)
             elif ext == ".xml":
@@ -137,12 +232,99 @@ class DocumentService:
                 # Try markup parsing as fallback
                 parsed = DocumentService.parse_markup(file_bytes)
             
-            return DocumentService.flatten_json(parsed)
+            for page in parsed["pages"]:
+                yield page["page"], " ".join(item["content"] for item in page["items"])
             
         except DocumentProcessingError:
             raise
         except Exception as e:
             raise DocumentProcessingError(f"Unsupported file type {ext}: {str(e)}")
+    
+    @staticmethod
+    def flatten_pages(pages: Iterable[Tuple[int, str]]) -> str:
+        """
+        Join (page_number, text) pairs in the "<page> text <content>" layout of
+        flatten_json, with PAGE_BREAK between pages so split_pages can undo it
+        """
+        return PAGE_BREAK.join(
+            f"{page_num} text {text.replace(PAGE_BREAK, ' ')}" for page_num, text in pages
+        )
+    
+    @staticmethod
+    def split_pages(text: str) -> List[Tuple[Optional[int], str]]:
+        """
+        Split text in the flatten_pages layout back into (page_number, text).
+        Pages are only split at PAGE_BREAK; text without one (a single page,
+        or stored before pages were delimited) is returned as one page
+        numbered None rather than guessing page numbers from the prose.
+        """
+        text = text or ""
+        if PAGE_BREAK not in text:
+            return [(None, text)]
+        pages = []
+        for part in text.split(PAGE_BREAK):
+            match = _PAGE_MARKER.match(part)
+            if not match:
+                return [(None, text.replace(PAGE_BREAK, " "))]
+            pages.append((int(match.group(1)), part[match.end():].strip()))
+        return pages
+    
+    @staticmethod
+    def chunk_pages(text: str, max_chars: int) -> List[Dict[str, Any]]:
+        """
+        Group the pages of flattened text into chunks of at most max_chars,
+        breaking only between pages unless a single page is longer than that.
+        Each chunk is {"first_page", "last_page", "text"} with its text kept
+        in the flatten_pages layout so page numbers stay visible.
+        """
+        chunks: List[Dict[str, Any]] = []
+        current: List[Tuple[Optional[int], str]] = []
+        size = 0
+        
+        def close():
+            if current:
+                chunks.append({
+                    "first_page": current[0][0],
+                    "last_page": current[-1][0],
+                    "text": (
+                        DocumentService.flatten_pages(current) if current[0][0] is not None
+                        else " ".join(piece for _, piece in current)
+                    ),
+                })
+        
+        for page_num, page_text in DocumentService.split_pages(text):
+            for piece in _split_long_text(page_text, max_chars):
+                piece_size = len(piece) + 16
+                if current and size + piece_size > max_chars:
+                    close()
+                    current, size = [], 0
+                current.append((page_num, piece))
+                size += piece_size
+        close()
+        return chunks
+    
+    @staticmethod
+    def extract_text_from_bytes(filename: str, file_bytes: bytes) -> str:
+        """
+        Extract and flatten text from uploaded file bytes
+        """
+        return DocumentService.flatten_pages(DocumentService.iter_pages(filename, file_bytes))
+
+
+def _split_long_text(text: str, max_chars: int) -> List[str]:
+    """Split text into pieces of at most max_chars, preferring sentence then word boundaries"""
+    pieces = []
+    while len(text) > max_chars > 0:
+        cut = text.rfind(". ", 0, max_chars)
+        if cut < max_chars // 2:
+            cut = text.rfind(" ", 0, max_chars)
+        if cut <= 0:
+            cut = max_chars - 1
+        pieces.append(text[:cut + 1].strip())
+        text = text[cut + 1:].lstrip()
+    if text or not pieces:
+        pieces.append(text)
+    return pieces
 
 
 # Global document service instance
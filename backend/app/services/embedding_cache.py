@@ -0,0 +1,81 @@
+"""
+Content-addressed embedding cache
+"""
+import hashlib
+from typing import Any, Dict, List, Optional
+from app.core.cache import LRUCache, SQLiteStore
+
+
+class CachedEmbeddings:
+    """
+    Two-tier cache in front of a LangChain embeddings client.
+    Vectors are keyed by a SHA-256 of model name, task and text; lookups hit
+    the in-process LRU first, then the local SQLite store, then the client.
+    """
+
+    def __init__(self, client, model_name: str, memory_size: int, store_path: Optional[str] = None):
+        self.client = client
+        self.model_name = model_name
+        self.memory = LRUCache(memory_size)
+        self.store = SQLiteStore(store_path, table="embeddings") if store_path else None
+        self.computed = 0
+
+    def _key(self, task: str, text: str) -> str:
+        # Query and document embeddings use different task types, so both are part of the key
+        return hashlib.sha256(f"{self.model_name}\0{task}\0{text}".encode("utf-8")).hexdigest()
+
+    def embed_query(self, text: str) -> List[float]:
+        key = self._key("query", text)
+        vector = self._lookup([key]).get(key)
+        if vector is None:
+            vector = self.client.embed_query(text)
+            self.computed += 1
+            self._remember({key: vector})
+        return vector
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        keys = [self._key("document", t) for t in texts]
+        found = self._lookup(keys)
+
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in found:
+                missing.setdefault(key, text)
+
+        if missing:
+            vectors = self.client.embed_documents(list(missing.values()))
+            computed = dict(zip(missing.keys(), vectors))
+            self.computed += len(computed)
+            self._remember(computed)
+            found.update(computed)
+
+        return [found[key] for key in keys]
+
+    def _lookup(self, keys: List[str]) -> Dict[str, List[float]]:
+        found = {}
+        for key in keys:
+            vector = self.memory.get(key)
+            if vector is not None:
+                found[key] = vector
+
+        remaining = [k for k in keys if k not in found]
+        if remaining and self.store:
+            from_disk = self.store.get_many(remaining)
+            for key, vector in from_disk.items():
+                self.memory.set(key, vector)
+            found.update(from_disk)
+        return found
+
+    def _remember(self, vectors: Dict[str, List[float]]):
+        for key, vector in vectors.items():
+            self.memory.set(key, vector)
+        if self.store:
+            self.store.set_many(vectors)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "model": self.model_name,
+            "memory": self.memory.stats(),
+            "persistent": self.store.stats() if self.store else None,
+            "computed": self.computed,
+        }
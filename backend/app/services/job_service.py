@@ -0,0 +1,226 @@
+"""
+Background job execution and status tracking
+"""
+import copy
+import time
+import uuid
+import threading
+import traceback
+from collections import OrderedDict
+from contextlib import contextmanager
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+from app.core.cache import SQLiteStore
+from app.core.config import settings
+from app.core.exceptions import QueueFullError
+
+FINISHED_STATUSES = ("succeeded", "failed")
+
+
+class InMemoryJobStore:
+    """
+    Job store kept in process memory. Finished jobs are dropped ttl_seconds
+    after their last update and, beyond max_entries, oldest first.
+    """
+
+    def __init__(self, ttl_seconds: Optional[float] = None, max_entries: Optional[int] = None):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._jobs: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def save(self, job: Dict):
+        with self._lock:
+            self._jobs[job["job_id"]] = (time.time(), copy.deepcopy(job))
+            self._jobs.move_to_end(job["job_id"])
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        with self._lock:
+            entry = self._jobs.get(job_id)
+            return copy.deepcopy(entry[1]) if entry else None
+
+    def prune(self) -> int:
+        """Drop expired finished jobs; returns the number dropped"""
+        cutoff = time.time() - self.ttl_seconds if self.ttl_seconds else float("-inf")
+        with self._lock:
+            excess = len(self._jobs) - self.max_entries if self.max_entries else 0
+            expired = []
+            # Least recently updated first; queued and running jobs are never dropped
+            for job_id, (stored_at, job) in self._jobs.items():
+                if job["status"] not in FINISHED_STATUSES:
+                    continue
+                if stored_at < cutoff or len(expired) < excess:
+                    expired.append(job_id)
+            for job_id in expired:
+                del self._jobs[job_id]
+            return len(expired)
+
+
+class SQLiteJobStore:
+    """
+    Job store persisted to a local SQLite file so status survives restarts.
+    Jobs expire ttl_seconds after their last update and the oldest are
+    evicted beyond max_entries; active jobs are updated as they progress.
+    """
+
+    def __init__(self, path: str, ttl_seconds: Optional[float] = None, max_entries: Optional[int] = None):
+        self._store = SQLiteStore(path, table="jobs", ttl_seconds=ttl_seconds, max_entries=max_entries)
+
+    def save(self, job: Dict):
+        self._store.set(job["job_id"], job)
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        return self._store.get(job_id)
+
+    def prune(self) -> int:
+        return self._store.purge_expired()
+
+
+class JobContext:
+    """Handle passed to a job function for reporting stage progress"""
+
+    def __init__(self, service: "JobService", job_id: str):
+        self._service = service
+        self.job_id = job_id
+        self._stage: Optional[Dict] = None
+
+    @contextmanager
+    def stage(self, name: str, total: Optional[int] = None):
+        """Record timing and outcome of one pipeline stage"""
+        started = time.perf_counter()
+        stage = {
+            "name": name,
+            "status": "running",
+            "started_at": datetime.now().isoformat(),
+            "finished_at": None,
+            "elapsed_seconds": None,
+            "done": 0,
+            "total": total,
+        }
+        self._stage = stage
+        self._service._update(self.job_id, lambda job: job["stages"].append(dict(stage)))
+        try:
+            yield self
+            stage["status"] = "completed"
+        except Exception:
+            stage["status"] = "failed"
+            raise
+        finally:
+            stage["finished_at"] = datetime.now().isoformat()
+            stage["elapsed_seconds"] = round(time.perf_counter() - started, 3)
+            self._stage = None
+            self._sync_stage(stage)
+
+    def progress(self, done: int, total: Optional[int] = None):
+        """Update progress counters of the current stage"""
+        stage = self._stage
+        if stage is None:
+            return
+        stage["done"] = done
+        if total is not None:
+            stage["total"] = total
+        self._sync_stage(stage)
+
+    def _sync_stage(self, stage: Dict):
+        def write(job: Dict):
+            job["stages"][-1] = dict(stage)
+        self._service._update(self.job_id, write)
+
+
+class JobService:
+    """Runs jobs on a bounded worker pool and tracks their status"""
+
+    def __init__(self, store, max_workers: int, max_queue: int):
+        self.store = store
+        self.max_workers = max(1, max_workers)
+        self.max_queue = max(0, max_queue)
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="job")
+        self._slots = threading.BoundedSemaphore(self.max_workers + self.max_queue)
+        self._lock = threading.Lock()
+
+    def submit(self, kind: str, fn: Callable[..., Any], *args, **kwargs) -> str:
+        """
+        Queue fn(ctx, *args, **kwargs) and return its job id.
+        Raises QueueFullError when all workers are busy and the queue is full.
+        """
+        if not self._slots.acquire(blocking=False):
+            raise QueueFullError(
+                f"{self.max_workers} jobs running and {self.max_queue} queued; retry later"
+            )
+
+        self.store.prune()
+        job_id = str(uuid.uuid4())
+        self.store.save({
+            "job_id": job_id,
+            "kind": kind,
+            "status": "queued",
+            "created_at": datetime.now().isoformat(),
+            "started_at": None,
+            "finished_at": None,
+            "elapsed_seconds": None,
+            "stages": [],
+            "result": None,
+            "error": None,
+        })
+
+        # The payload (e.g. upload bytes) is released as soon as the job finishes
+        payload = [args, kwargs]
+        try:
+            future = self._executor.submit(self._run, job_id, fn, payload)
+        except Exception:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return job_id
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        return self.store.get(job_id)
+
+    def shutdown(self, wait: bool = False):
+        self._executor.shutdown(wait=wait, cancel_futures=True)
+
+    def _run(self, job_id: str, fn: Callable[..., Any], payload: List):
+        started = time.perf_counter()
+        self._update(job_id, lambda job: job.update(
+            status="running", started_at=datetime.now().isoformat()
+        ))
+        try:
+            try:
+                result = fn(JobContext(self, job_id), *payload[0], **payload[1])
+            finally:
+                payload.clear()
+            self._update(job_id, lambda job: job.update(status="succeeded", result=result))
+        except Exception as e:
+            print(f"Job {job_id} failed: {e}")
+            traceback.print_exc()
+            detail = getattr(e, "detail", None) or str(e)
+            self._update(job_id, lambda job: job.update(status="failed", error=detail))
+        finally:
+            elapsed = round(time.perf_counter() - started, 3)
+            self._update(job_id, lambda job: job.update(
+                finished_at=datetime.now().isoformat(), elapsed_seconds=elapsed
+            ))
+
+    def _update(self, job_id: str, mutate: Callable[[Dict], Any]):
+        with self._lock:
+            job = self.store.get(job_id)
+            if job is None:
+                return
+            mutate(job)
+            self.store.save(job)
+
+
+def _create_job_store():
+    retention = dict(ttl_seconds=settings.JOB_RETENTION_SECONDS or None, max_entries=settings.JOB_MAX_RETAINED or None)
+    if settings.JOB_STORE == "sqlite":
+        return SQLiteJobStore(settings.JOB_STORE_PATH, **retention)
+    return InMemoryJobStore(**retention)
+
+
+# Global job service instance
+job_service = JobService(
+    _create_job_store(),
+    max_workers=settings.JOB_WORKERS,
+    max_queue=settings.JOB_QUEUE_SIZE,
+)
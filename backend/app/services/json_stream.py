@@ -0,0 +1,84 @@
+"""
+Incremental parsing of a JSON array inside a streamed model response
+"""
+import json
+from typing import Any, List, Tuple
+
+
+class JSONArrayStream:
+    """
+    Finds the array under `key` in a JSON object that is still being
+    received and returns each object in it once it is complete. feed()
+    takes the text received so far; when it no longer extends the previous
+    text (the call was retried), parsing restarts and objects are reported
+    again with the same indexes, so callers can skip the ones already handled.
+    """
+
+    def __init__(self, key: str):
+        self.marker = json.dumps(key)
+        self._reset("")
+
+    def feed(self, text: str) -> List[Tuple[int, Any]]:
+        """Return (index, element) for every element completed since the last feed"""
+        if not text.startswith(self._text):
+            self._reset(text)
+        self._text = text
+
+        found = []
+        if self._array_start < 0 and not self._find_array():
+            return found
+
+        while self._pos < len(text):
+            ch = text[self._pos]
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif ch == "\\":
+                    self._escaped = True
+                elif ch == '"':
+                    self._in_string = False
+            elif ch == '"':
+                self._in_string = True
+            elif ch in "{[":
+                if self._depth == 0:
+                    self._element_start = self._pos
+                self._depth += 1
+            elif ch in "}]":
+                if self._depth == 0:
+                    # End of the array itself
+                    self._pos = len(text)
+                    break
+                self._depth -= 1
+                if self._depth == 0:
+                    found.extend(self._element(self._element_start, self._pos + 1))
+            self._pos += 1
+        return found
+
+    def _reset(self, text: str):
+        self._text = text
+        self._array_start = -1
+        self._pos = 0
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+        self._element_start = 0
+        self._count = 0
+
+    def _find_array(self) -> bool:
+        key_at = self._text.find(self.marker)
+        if key_at < 0:
+            return False
+        bracket = self._text.find("[", key_at + len(self.marker))
+        if bracket < 0:
+            return False
+        self._array_start = bracket
+        self._pos = bracket + 1
+        return True
+
+    def _element(self, start: int, end: int) -> List[Tuple[int, Any]]:
+        try:
+            value = json.loads(self._text[start:end])
+        except ValueError:
+            return []
+        self._count += 1
+        return [(self._count - 1, value)]
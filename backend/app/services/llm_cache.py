@@ -0,0 +1,65 @@
+"""
+Content-addressed cache for LLM responses
+"""
+import json
+import time
+import hashlib
+from typing import Any, Dict, Optional
+from app.core.cache import LRUCache, SQLiteStore
+
+
+class LLMResponseCache:
+    """
+    Two-tier cache of model responses. Entries are keyed by a SHA-256 of the
+    model name, the full prompt and the generation config, so any change to
+    the prompt template or config is a different entry. Lookups hit the
+    in-process LRU first, then the local SQLite store.
+    """
+
+    def __init__(
+        self,
+        memory_size: int,
+        store_path: Optional[str] = None,
+        ttl_seconds: Optional[float] = None,
+        max_entries: Optional[int] = None,
+    ):
+        self.memory = LRUCache(memory_size, ttl_seconds=ttl_seconds)
+        self.store = (
+            SQLiteStore(store_path, table="llm_responses", ttl_seconds=ttl_seconds, max_entries=max_entries)
+            if store_path else None
+        )
+        self.lookup_seconds = 0.0
+        self.lookups = 0
+
+    @staticmethod
+    def key(model_name: str, prompt: Any, generation_config: Optional[Dict]) -> str:
+        payload = json.dumps(
+            {"model": model_name, "prompt": prompt, "config": generation_config or {}},
+            sort_keys=True,
+            ensure_ascii=False,
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        start = time.perf_counter()
+        text = self.memory.get(key)
+        if text is None and self.store:
+            entry = self.store.get(key)
+            if entry is not None:
+                text = entry["text"]
+                self.memory.set(key, text)
+        self.lookup_seconds += time.perf_counter() - start
+        self.lookups += 1
+        return text
+
+    def set(self, key: str, text: str):
+        self.memory.set(key, text)
+        if self.store:
+            self.store.set(key, {"text": text})
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "memory": self.memory.stats(),
+            "persistent": self.store.stats() if self.store else None,
+            "avg_lookup_ms": round(self.lookup_seconds / self.lookups * 1000, 3) if self.lookups else 0.0,
+        }
@@ -1,6 +1,9 @@
 import os
 import json
-from typing import List, Dict, Optional
+import time
+import argparse
+from itertools import islice
+from typing import Iterable, List, Dict, Optional, Tuple
 from google.cloud.sql.connector import Connector, IPTypes
 import pg8000
 import sqlalchemy
@@ -9,6 +12,8 @@ from sqlalchemy import text
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain_google_genai import GoogleGenerativeAIEmbeddings
 from app.core.config import settings
+from app.core.cache import LRUCache
+from app.services.embedding_cache import CachedEmbeddings
 
 
 class VectorDBService:
@@ -46,51 +51,209 @@ class VectorDBService:
             max_overflow=2,
         )
 
-        # Embedding model
-        self.embeddings = GoogleGenerativeAIEmbeddings(
-            model="models/embedding-001",
-            google_api_key=settings.GOOGLE_API_KEY,
+        # Embedding model, fronted by a content-addressed cache
+        embedding_model = "models/embedding-001"
+        self.embeddings = CachedEmbeddings(
+            GoogleGenerativeAIEmbeddings(
+                model=embedding_model,
+                google_api_key=settings.GOOGLE_API_KEY,
+            ),
+            model_name=embedding_model,
+            memory_size=settings.EMBEDDING_CACHE_SIZE,
+            store_path=settings.EMBEDDING_CACHE_PATH,
         )
 
+        # Search results are cached until new rows are stored
+        self.search_cache = LRUCache(settings.SEARCH_CACHE_SIZE)
+
         # Text splitter
         self.text_splitter = RecursiveCharacterTextSplitter(
             chunk_size=1000, chunk_overlap=200, length_function=len
         )
 
         self.table_name = "documents"
+        # Whether rows embedded with the query task type remain (None until checked)
+        self._legacy_query_rows: Optional[bool] = None
 
     # ----------------------------------------------------------------------
     # Store Document
     # ----------------------------------------------------------------------
-    def store_document(self, content: str, metadata: Optional[Dict] = None):
-        """Split content into chunks, embed, and store in Postgres."""
+    def store_document(
+        self, content: str, metadata: Optional[Dict] = None, batch_size: Optional[int] = None
+    ) -> Dict:
+        """
+        Split content into chunks, embed them in batches and store in Postgres.
+        Returns per-batch embedding/insert timings so batch size can be tuned.
+        """
+        chunks = self.text_splitter.split_text(content)
+        return self._store_chunks(((chunk, metadata or {}) for chunk in chunks), batch_size)
+
+    def store_pages(
+        self,
+        pages: Iterable[Tuple[int, str]],
+        metadata: Optional[Dict] = None,
+        batch_size: Optional[int] = None,
+    ) -> Dict:
+        """
+        Chunk, embed and store a stream of (page_number, text) pages.
+        Each chunk's metadata records the page it came from; pages are
+        consumed lazily so memory stays bounded by the batch size.
+        """
+        def chunks():
+            for page_number, page_text in pages:
+                for chunk in self.text_splitter.split_text(page_text):
+                    yield chunk, {**(metadata or {}), "page": page_number}
+
+        return self._store_chunks(chunks(), batch_size)
+
+    def _store_chunks(self, chunks: Iterable[Tuple[str, Dict]], batch_size: Optional[int] = None) -> Dict:
+        """Embed and insert (chunk, metadata) pairs batch by batch in one transaction."""
         try:
-            chunks = self.text_splitter.split_text(content)
-            print(f"📄 Created {len(chunks)} chunks")
+            batch_size = max(1, batch_size or settings.EMBEDDING_BATCH_SIZE)
+            chunks = iter(chunks)
 
+            batches = []
+            stored = 0
+            started = time.perf_counter()
             with self.engine.begin() as conn:
-                for chunk in chunks:
-                    vector = self.embeddings.embed_query(chunk)
-                    vector_str = "[" + ",".join(map(str, vector)) + "]"
+                task = self._document_task(conn)
+                while True:
+                    batch = [
+                        (chunk, {**metadata, "embedding_task": task})
+                        for chunk, metadata in islice(chunks, batch_size)
+                    ]
+                    if not batch:
+                        break
 
-                    query = text(f"""
-                        INSERT INTO {self.table_name} (content, metadata, embedding)
-                        VALUES (:content, :metadata, (:embedding)::vector)
-                    """)
+                    embed_start = time.perf_counter()
+                    texts = [chunk for chunk, _ in batch]
+                    if task == "document":
+                        vectors = self.embeddings.embed_documents(texts)
+                    else:
+                        vectors = [self.embeddings.embed_query(t) for t in texts]
+                    insert_start = time.perf_counter()
+                    self._insert_chunks(conn, batch, vectors)
+                    insert_end = time.perf_counter()
 
-                    conn.execute(query, {
-                        "content": chunk,
-                        "metadata": json.dumps(metadata or {}),
-                        "embedding": vector_str,
-                    })
+                    stored += len(batch)
+                    timing = {
+                        "batch": len(batches) + 1,
+                        "chunks": len(batch),
+                        "embed_seconds": round(insert_start - embed_start, 3),
+                        "insert_seconds": round(insert_end - insert_start, 3),
+                    }
+                    batches.append(timing)
+                    print(
+                        f"⏱ Batch {timing['batch']}: {timing['chunks']} chunks, "
+                        f"embed {timing['embed_seconds']}s, insert {timing['insert_seconds']}s"
+                    )
 
+            if stored:
+                self.search_cache.clear()
 
-            print(f"✅ Stored {len(chunks)} chunks successfully in pgvector.")
+            elapsed = round(time.perf_counter() - started, 3)
+            print(f"✅ Stored {stored} chunks successfully in pgvector ({elapsed}s).")
+            return {
+                "chunks": stored,
+                "batch_size": batch_size,
+                "elapsed_seconds": elapsed,
+                "batches": batches,
+            }
 
         except Exception as e:
             print(f"❌ Error storing document: {e}")
             raise
 
+    def _document_task(self, conn) -> str:
+        """
+        Embedding task type for new chunks. Rows stored before documents were
+        embedded with the document task type used the query task type; until
+        reembed_legacy_chunks has converted them, new chunks use the query
+        task type too so every stored vector is comparable.
+        """
+        if self._legacy_query_rows is not False:
+            self._legacy_query_rows = bool(conn.execute(text(f"""
+                SELECT EXISTS (
+                    SELECT 1 FROM {self.table_name}
+                    WHERE metadata->>'embedding_task' IS DISTINCT FROM 'document'
+                )
+            """)).scalar())
+        return "query" if self._legacy_query_rows else "document"
+
+    def reembed_legacy_chunks(self, batch_size: Optional[int] = None) -> int:
+        """
+        Backfill: re-embed rows stored with the query task type using the
+        document task type, one committed batch at a time so it can be
+        interrupted and resumed. Returns the number of rows re-embedded.
+        """
+        batch_size = max(1, batch_size or settings.EMBEDDING_BATCH_SIZE)
+        select = text(f"""
+            SELECT ctid::text AS row_id, content
+            FROM {self.table_name}
+            WHERE metadata->>'embedding_task' IS DISTINCT FROM 'document'
+            LIMIT :batch_size
+            FOR UPDATE SKIP LOCKED
+        """)
+        update = text(f"""
+            UPDATE {self.table_name}
+            SET embedding = (:embedding)::vector,
+                metadata = COALESCE(metadata, '{{}}'::jsonb) || '{{"embedding_task": "document"}}'::jsonb
+            WHERE ctid = (:row_id)::tid
+        """)
+
+        total = 0
+        while True:
+            with self.engine.begin() as conn:
+                rows = conn.execute(select, {"batch_size": batch_size}).fetchall()
+                if not rows:
+                    break
+                vectors = self.embeddings.embed_documents([r.content for r in rows])
+                conn.execute(update, [
+                    {"row_id": r.row_id, "embedding": self._vector_literal(vector)}
+                    for r, vector in zip(rows, vectors)
+                ])
+            total += len(rows)
+            print(f"Re-embedded {total} chunks with the document task type.")
+
+        self._legacy_query_rows = False
+        if total:
+            self.search_cache.clear()
+        return total
+
+    def _insert_chunks(self, conn, chunks: List[Tuple[str, Dict]], vectors: List[List[float]]):
+        """Write a batch of chunks with a single multi-row INSERT."""
+        values = []
+        params = {}
+        for i, ((chunk, metadata), vector) in enumerate(zip(chunks, vectors)):
+            values.append(f"(:content_{i}, :metadata_{i}, (:embedding_{i})::vector)")
+            params[f"content_{i}"] = chunk
+            params[f"metadata_{i}"] = json.dumps(metadata)
+            params[f"embedding_{i}"] = self._vector_literal(vector)
+
+        if not values:
+            return
+
+        query = text(f"""
+            INSERT INTO {self.table_name} (content, metadata, embedding)
+            VALUES {", ".join(values)}
+        """)
+        conn.execute(query, params)
+
+    @staticmethod
+    def _vector_literal(vector: List[float]) -> str:
+        """Format an embedding as a pgvector literal."""
+        return "[" + ",".join(map(str, vector)) + "]"
+
+    # ----------------------------------------------------------------------
+    # Cache statistics
+    # ----------------------------------------------------------------------
+    def cache_stats(self) -> Dict:
+        """Hit/miss counters for the embedding and search result caches."""
+        return {
+            "embeddings": self.embeddings.stats(),
+            "search_results": self.search_cache.stats(),
+        }
+
     # ----------------------------------------------------------------------
     # Semantic Search
     # ----------------------------------------------------------------------
@@ -98,9 +261,14 @@ class VectorDBService:
     self, query: str, top_k: int = 5, metadata_filter: Optional[Dict] = None
 ) -> List[Dict]:
         """Perform semantic search using cosine similarity."""
+        cache_key = (query, top_k, json.dumps(metadata_filter or {}, sort_keys=True))
+        cached = self.search_cache.get(cache_key)
+        if cached is not None:
+            return [dict(r) for r in cached]
+
         try:
             query_vector = self.embeddings.embed_query(query)
-            query_vector_str = "[" + ",".join(map(str, query_vector)) + "]"
+            query_vector_str = self._vector_literal(query_vector)
 
             filter_clause = ""
             params = {"query_vec": query_vector_str, "top_k": top_k}
@@ -126,13 +294,28 @@ class VectorDBService:
             ]
 
             print(f"🔍 Found {len(results)} similar results.")
-            return results
+            self.search_cache.set(cache_key, results)
+            return [dict(r) for r in results]
 
         except Exception as e:
             print(f"❌ Error during semantic search: {e}")
             raise
 
 
-
 # ✅ Global Singleton Instance
 vector_db_service = VectorDBService()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Maintain the pgvector document store")
+    parser.add_argument(
+        "--reembed", action="store_true", help="re-embed chunks stored with the query task type as documents"
+    )
+    args = parser.parse_args()
+
+    if args.reembed:
+        print(f"documents: re-embedded {vector_db_service.reembed_legacy_chunks()} chunks")
+
+
+if __name__ == "__main__":
+    main()
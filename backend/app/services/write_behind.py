@@ -0,0 +1,234 @@
+"""
+Write-behind helpers: a buffer that coalesces keyed updates into periodic
+batch flushes, and an appender that persists results in micro-batches
+"""
+import time
+import queue
+import threading
+import traceback
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+
+
+class WriteBehindBuffer:
+    """
+    Collects keyed updates per target and hands each target's pending batch
+    to its flush handler on a short interval. A later write to the same key
+    replaces the earlier value. Every put() returns a sequence number that
+    wait_for() can block on to get read-your-writes.
+    """
+
+    def __init__(self, flush_interval: float, max_attempts: int = 5):
+        self.flush_interval = flush_interval
+        self.max_attempts = max(1, max_attempts)
+        self._handlers: Dict[str, Callable[[Dict[Hashable, Any]], None]] = {}
+        # target -> key -> (sequence numbers coalesced into this entry, value, attempts)
+        self._pending: Dict[str, Dict[Hashable, Tuple[Tuple[int, ...], Any, int]]] = {}
+        self._cond = threading.Condition()
+        self._flush_lock = threading.Lock()
+        self._seq = 0
+        self._flushed_seq = 0
+        self._dropped_seqs = set()
+        self._flush_requested = False
+        self._closed = False
+        self._thread: Optional[threading.Thread] = None
+        self.flushes = 0
+        self.coalesced = 0
+        self.failures = 0
+
+    def register(self, target: str, handler: Callable[[Dict[Hashable, Any]], None]):
+        """Register the function that writes a {key: value} batch for target"""
+        self._handlers[target] = handler
+        self._pending.setdefault(target, {})
+
+    def put(self, target: str, key: Hashable, value: Any) -> int:
+        """Queue an update and return its sequence number"""
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("Write-behind buffer is closed")
+            self._seq += 1
+            entries = self._pending[target]
+            seqs = (self._seq,)
+            if key in entries:
+                self.coalesced += 1
+                seqs = entries[key][0] + seqs
+            entries[key] = (seqs, value, 0)
+            self._ensure_thread()
+            return self._seq
+
+    def wait_for(self, seq: int, timeout: Optional[float] = None) -> bool:
+        """
+        Block until the update with sequence number seq has been flushed.
+        Returns False on timeout; raises RuntimeError if it was dropped.
+        """
+        with self._cond:
+            self._flush_requested = True
+            self._cond.notify_all()
+            flushed = self._cond.wait_for(lambda: self._flushed_seq >= seq, timeout=timeout)
+            if seq in self._dropped_seqs:
+                raise RuntimeError(f"Buffered write {seq} was dropped after {self.max_attempts} failed flushes")
+            return flushed
+
+    def flush(self):
+        """Write all pending updates now"""
+        with self._flush_lock:
+            with self._cond:
+                batches = {target: entries for target, entries in self._pending.items() if entries}
+                for target in batches:
+                    self._pending[target] = {}
+
+            for target, entries in batches.items():
+                try:
+                    self._handlers[target]({key: entry[1] for key, entry in entries.items()})
+                    self.flushes += 1
+                except Exception as e:
+                    self.failures += 1
+                    print(f"Write-behind flush for {target} failed ({len(entries)} updates): {e}")
+                    traceback.print_exc()
+                    self._requeue(target, entries)
+
+            with self._cond:
+                pending_seqs = [
+                    entry[0][0] for entries in self._pending.values() for entry in entries.values()
+                ]
+                self._flushed_seq = min(pending_seqs) - 1 if pending_seqs else self._seq
+                self._cond.notify_all()
+
+    def close(self, timeout: Optional[float] = None):
+        """Stop the flusher thread after writing everything still pending"""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        if self._thread:
+            self._thread.join(timeout=timeout)
+        self.flush()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            return {
+                "pending": {target: len(entries) for target, entries in self._pending.items()},
+                "last_seq": self._seq,
+                "flushed_seq": self._flushed_seq,
+                "flushes": self.flushes,
+                "coalesced": self.coalesced,
+                "failures": self.failures,
+                "dropped": len(self._dropped_seqs),
+            }
+
+    def _requeue(self, target: str, entries: Dict[Hashable, Tuple[Tuple[int, ...], Any, int]]):
+        """Put failed updates back unless a newer write superseded them"""
+        with self._cond:
+            pending = self._pending[target]
+            for key, (seqs, value, attempts) in entries.items():
+                if key in pending:
+                    newer_seqs, newer_value, newer_attempts = pending[key]
+                    pending[key] = (seqs + newer_seqs, newer_value, newer_attempts)
+                elif attempts + 1 >= self.max_attempts:
+                    print(f"Dropping buffered {target} update for {key} after {attempts + 1} attempts")
+                    self._dropped_seqs.update(seqs)
+                else:
+                    pending[key] = (seqs, value, attempts + 1)
+
+    def _ensure_thread(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name="write-behind", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._flush_requested or self._closed, timeout=self.flush_interval)
+                self._flush_requested = False
+                if self._closed:
+                    return
+            self.flush()
+
+
+_CLOSE = object()
+
+
+class BatchAppender:
+    """
+    Appends items through sink(batch) on a single writer thread, so writes
+    overlap with whatever is producing the items. A batch is written once
+    it holds batch_size items or flush_interval seconds after its first
+    item arrived; items from one add() call always land in the same batch.
+    on_flush(batch) runs on the writer thread after each successful write.
+    """
+
+    def __init__(
+        self,
+        sink: Callable[[List[Any]], None],
+        batch_size: int,
+        flush_interval: float,
+        on_flush: Optional[Callable[[List[Any]], None]] = None,
+        max_pending: int = 0,
+        name: str = "batch-appender",
+    ):
+        self.sink = sink
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval
+        self.on_flush = on_flush
+        # A bounded queue makes producers wait when writes fall behind
+        self._queue: "queue.Queue" = queue.Queue(maxsize=max_pending)
+        self.written = 0
+        self.batches = 0
+        self.error: Optional[Exception] = None
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+
+    def add(self, items: List[Any]):
+        """Queue items for writing; raises if an earlier write failed"""
+        if self.error:
+            raise RuntimeError(f"Earlier batch write failed: {self.error}")
+        if items:
+            self._queue.put(list(items))
+
+    def close(self) -> int:
+        """Write what is still queued, stop the writer and return the number of items written"""
+        self._queue.put(_CLOSE)
+        self._thread.join()
+        if self.error:
+            raise RuntimeError(f"Batch write failed after {self.written} items: {self.error}")
+        return self.written
+
+    def _run(self):
+        batch: List[Any] = []
+        deadline = None
+        while True:
+            timeout = max(0.0, deadline - time.monotonic()) if deadline is not None else None
+            try:
+                items = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                self._flush(batch)
+                batch, deadline = [], None
+                continue
+
+            if items is _CLOSE:
+                self._flush(batch)
+                return
+
+            batch.extend(items)
+            if deadline is None:
+                deadline = time.monotonic() + self.flush_interval
+            if len(batch) >= self.batch_size:
+                self._flush(batch)
+                batch, deadline = [], None
+
+    def _flush(self, batch: List[Any]):
+        # After a failure, queued items are drained and dropped so producers never block
+        if not batch or self.error:
+            return
+        try:
+            self.sink(batch)
+            self.written += len(batch)
+            self.batches += 1
+        except Exception as e:
+            self.error = e
+            print(f"Batch write of {len(batch)} items failed: {e}")
+            traceback.print_exc()
+            return
+        if self.on_flush:
+            try:
+                self.on_flush(batch)
+            except Exception as e:
+                print(f"Batch flush callback failed: {e}")
@@ -9,6 +9,11 @@ from contextlib import asynccontextmanager
 from app.core.config import settings
 from app.api.v1.api import api_router
 from app.core.database import init_bigquery_client
+from app.core.schema import ensure_tables
+from app.core.executors import shutdown_executors
+from app.services.document_service import shutdown_pdf_pool
+from app.services.job_service import job_service
+from app.services.database_service import database_service
 
 
 @asynccontextmanager
@@ -16,9 +21,15 @@ async def lifespan(app: FastAPI):
     """Application lifespan events"""
     # Startup
     init_bigquery_client()
+    if settings.BIGQUERY_ENSURE_TABLES:
+        ensure_tables()
+    database_service.start_compaction()
     yield
     # Shutdown
-    pass
+    job_service.shutdown()
+    database_service.close()
+    shutdown_executors()
+    shutdown_pdf_pool()
 
 
 def create_application() -> FastAPI:
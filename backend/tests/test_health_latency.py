@@ -0,0 +1,114 @@
+"""
+/health must stay responsive while an upload is being processed.
+
+The Google Cloud, Cloud SQL and embedding clients are replaced with mocks
+before the app is imported, and the upload's blocking calls (job store,
+parsing, vector store) are stubbed to sleep.
+"""
+import os
+import sys
+import time
+import tempfile
+import threading
+from unittest import mock
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("CACHE_DIR", tempfile.mkdtemp(prefix="health-latency-"))
+os.environ.setdefault("JOB_STORE", "memory")
+
+SLOW_CALL_SECONDS = 1.0
+HEALTH_SAMPLES = 10
+MAX_HEALTH_SECONDS = 0.25
+
+
+@pytest.fixture(scope="module")
+def client():
+    patches = [
+        mock.patch("google.cloud.bigquery.Client"),
+        mock.patch("google.cloud.sql.connector.Connector"),
+        mock.patch("langchain_google_genai.GoogleGenerativeAIEmbeddings"),
+    ]
+    for p in patches:
+        p.start()
+    try:
+        from fastapi.testclient import TestClient
+        from main import app
+
+        # Entering the client runs the app on one event loop shared by all requests
+        with TestClient(app) as test_client:
+            yield test_client
+    finally:
+        for p in patches:
+            p.stop()
+
+
+def _timed_get(client, path: str) -> float:
+    start = time.perf_counter()
+    response = client.get(path)
+    elapsed = time.perf_counter() - start
+    assert response.status_code == 200
+    return elapsed
+
+
+def test_health_latency_stays_flat_during_upload(client):
+    from app.services.job_service import job_service
+    from app.services.document_service import document_service
+    from app.services.vector_db_service import vector_db_service
+
+    baseline = max(_timed_get(client, "/health") for _ in range(HEALTH_SAMPLES))
+
+    busy = threading.Event()
+    real_submit = job_service.submit
+
+    def slow_submit(*args, **kwargs):
+        # Blocking job-store write made from the async upload endpoint
+        busy.set()
+        time.sleep(SLOW_CALL_SECONDS)
+        return real_submit(*args, **kwargs)
+
+    def slow_pages(filename, content):
+        for page in range(1, 4):
+            time.sleep(SLOW_CALL_SECONDS / 2)
+            yield page, f"Requirement text for page {page}"
+
+    def slow_store(pages, metadata=None, **kwargs):
+        consumed = list(pages)
+        time.sleep(SLOW_CALL_SECONDS)
+        return {"chunks": len(consumed), "batches": [len(consumed)], "elapsed_seconds": SLOW_CALL_SECONDS}
+
+    upload_result = {}
+
+    def upload():
+        response = client.post(
+            "/api/v1/files/upload",
+            files={"requirement_files": ("large.txt", b"x" * (5 * 1024 * 1024), "text/plain")},
+        )
+        upload_result["status"] = response.status_code
+        upload_result["job_id"] = response.json().get("job_id")
+
+    with mock.patch.object(job_service, "submit", side_effect=slow_submit), \
+            mock.patch.object(document_service, "iter_pages", side_effect=slow_pages), \
+            mock.patch.object(vector_db_service, "store_pages", side_effect=slow_store):
+        uploader = threading.Thread(target=upload)
+        uploader.start()
+        assert busy.wait(5), "upload never reached its blocking call"
+
+        during = [_timed_get(client, "/health") for _ in range(HEALTH_SAMPLES)]
+        upload_running = uploader.is_alive()
+        uploader.join(10)
+
+        # Let the background pipeline finish while its stubs are still in place
+        deadline = time.monotonic() + 10
+        while time.monotonic() < deadline:
+            job = client.get(f"/api/v1/jobs/{upload_result.get('job_id')}").json()
+            if job.get("status") in ("succeeded", "failed"):
+                break
+            time.sleep(0.1)
+
+    assert max(during) < max(MAX_HEALTH_SECONDS, baseline * 5), (
+        f"/health took up to {max(during):.3f}s during an upload (baseline {baseline:.3f}s)"
+    )
+    assert upload_running, "health checks ran after the upload had finished"
+    assert upload_result["status"] == 202